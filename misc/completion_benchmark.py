@@ -0,0 +1,155 @@
+"""
+Checks and benchmarks conversion of TernJS completions into ST ones.
+
+Builds a corpus of `(name, type)` pairs from all types in bundled
+defs (`ternjs/defs/*.json`), verifies that `ternjs.completion` produces
+the same output as the original regexp-based implementation and
+measures both of them.
+
+Usage: python misc/completion_benchmark.py [repeat]
+"""
+import sys
+import os.path
+import re
+import json
+import glob
+import timeit
+
+BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(BASE_PATH, 'ternjs'))
+
+import completion
+
+def reference_sanitize_func_def(fn):
+	"Original implementation of `sanitize_func_def()` from tern.py"
+	m = re.match(r'fn\(', fn)
+	if not m: return None
+
+	args_str = re.sub(r'->\s*[^\)]*$', '', fn).strip()
+	args_str = args_str[3:-1]
+	sanitized_args = ''
+	i = 0
+	ln = len(args_str)
+	braces_stack = 0
+
+	while i < ln:
+		ch = args_str[i]
+		if ch == '(':
+			braces_stack += 1
+			j = i + 1
+			while j < ln:
+				ch2 = args_str[j]
+				if   ch2 == '(': braces_stack += 1
+				elif ch2 == ')': braces_stack -= 1
+				if braces_stack == 0: break
+				j += 1
+
+			i = j
+		else:
+			sanitized_args += ch
+
+		i += 1
+
+	return sanitized_args
+
+def reference_completion_hint(t):
+	suffix = ''
+	if t == '?':
+		suffix = 'unknown'
+	elif t == "number" or t == "string" or t == "bool":
+		suffix = t
+	elif re.match(r'fn\(', t):
+		suffix = 'fn'
+	elif re.match(r'\[', t):
+		suffix = 'array'
+	else:
+		suffix = 'object'
+
+	return completion.icons.get(suffix, suffix)
+
+def reference_completion_item(item):
+	"Original implementation of `completion_item()` from tern.py"
+	t = item['type']
+	label = item['text']
+	value = item['text'].replace('$', '\\$')
+	fn_def = reference_sanitize_func_def(t)
+	if fn_def is not None:
+		args = [p.split(':')[0].strip() for p in fn_def.split(',')]
+		label += '(%s)' % ', '.join(args)
+
+		# split args into mandatory and optional lists
+		opt_pos = len(args)
+		for i, a in enumerate(args):
+			if a and a[-1] == '?':
+				opt_pos = i
+				break
+
+		mn_args = args[0:opt_pos]
+		opt_args = args[opt_pos:]
+		value += '(' + ', '.join(['${%d:%s}' % (i + 1, v) for i, v in enumerate(mn_args)])
+		if opt_args:
+			offset = len(mn_args)
+			opt_args_str = ', '.join(['${%d:%s}' % (offset + i + 2, v[:-1]) for i, v in enumerate(opt_args)])
+			value += '${%d:, %s}' % (offset + 1, opt_args_str)
+
+		value += ')'
+	else:
+		label += '\t%s' % reference_completion_hint(t)
+
+	return (label, value)
+
+def collect_types(data, name, result):
+	if isinstance(data, dict):
+		if '!type' in data:
+			result.append({'text': name, 'type': data['!type']})
+		for k, v in data.items():
+			if not k.startswith('!') or k == '!define':
+				collect_types(v, k, result)
+	elif isinstance(data, str if sys.version_info[0] > 2 else basestring) and not name.startswith('!'):
+		result.append({'text': name, 'type': data})
+
+def build_corpus():
+	result = []
+	for f in glob.glob(os.path.join(BASE_PATH, 'ternjs', 'defs', '*.json')):
+		with open(f) as fd:
+			collect_types(json.load(fd), '', result)
+
+	# add a few edge cases
+	for t in ['?', '[number]', 'fn() -> fn(x: number)', 'fn(a: fn(b) -> number', 'fn(cb: fn()) -> ?']:
+		result.append({'text': 'edge$', 'type': t})
+
+	return result
+
+def main():
+	repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+	corpus = build_corpus()
+	fn_count = len([c for c in corpus if c['type'].startswith('fn(')])
+	print('Corpus: %d completions, %d functions' % (len(corpus), fn_count))
+
+	mismatches = 0
+	for item in corpus:
+		expected = reference_completion_item(item)
+		actual = completion.convert(item['text'], item['type'])
+		if expected != actual:
+			mismatches += 1
+			print('Mismatch for %r: %r != %r' % (item['type'], actual, expected))
+
+	print('Mismatches: %d' % mismatches)
+
+	def run(fn):
+		return lambda: [fn(item) for item in corpus]
+
+	cases = [
+		('original', run(reference_completion_item)),
+		('single-pass', run(lambda item: completion.convert(item['text'], item['type']))),
+		('memoized', run(completion.completion_item))
+	]
+
+	for name, fn in cases:
+		best = min(timeit.repeat(fn, number=1, repeat=repeat))
+		print('%-12s %8.2f ms per corpus, %6.2f us per item' % (name, best * 1000, best * 1e6 / len(corpus)))
+
+	return 1 if mismatches else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Headless check of incremental re-analysis of Node.js modules.
+
+Loads `tern.py` with fake `sublime` modules (see `fakesublime.py`)
+against a small project where `main.js` and `a.js` require `b.js`,
+then saves `b.js` the way editor does and checks that:
+
+* required modules are analyzed once, under project file names;
+* saving `b.js` re-analyzes its dependents;
+* completions of dependents see new exports of `b.js`.
+
+Exits with non-zero code if any check fails.
+
+Usage:
+	python misc/dependents_check.py [--set engine=node]
+"""
+import sys
+import os
+import os.path
+import re
+import json
+import shutil
+import tempfile
+import argparse
+
+BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakesublime
+from editor_benchmark import detect_engine
+
+FILES = {
+	'b.js': 'exports.hello = function() { return 1; };\n',
+	'a.js': 'var b = require("./b");\nexports.run = function() { return b.hello(); };\n',
+	'main.js': 'var a = require("./a");\nvar b = require("./b");\n'
+}
+
+def create_project(target_dir):
+	for name, text in FILES.items():
+		with open(os.path.join(target_dir, name), 'w') as f:
+			f.write(text)
+
+	project_file = os.path.join(target_dir, 'deps.sublime-project')
+	with open(project_file, 'w') as f:
+		json.dump({'folders': [{'path': '.'}], 'ternjs': {'plugins': {'node': {}}}}, f)
+
+	return project_file
+
+def complete(listener, view, expr):
+	"Types given expression at the end of view, returns completion names"
+	view.move_to(view.size())
+	view.type('\n' + expr)
+	pos = view.sel()[0].begin()
+	items = listener.on_query_completions(view, '', [pos]) or []
+	return [re.split(r'[\t(]', item[0])[0] for item in items]
+
+def main():
+	parser = argparse.ArgumentParser(description='Headless check of dependents re-analysis')
+	parser.add_argument('--set', action='append', default=[], help='override plugin setting, e.g. engine=node')
+	args = parser.parse_args()
+
+	work_dir = tempfile.mkdtemp(prefix='ternjs-deps-')
+	try:
+		return run(args, work_dir)
+	finally:
+		shutil.rmtree(work_dir, ignore_errors=True)
+
+def run(args, work_dir):
+	overrides = {'warm_start': False}
+	for item in args.set:
+		k, v = item.split('=', 1)
+		try:
+			v = json.loads(v)
+		except ValueError:
+			pass
+		overrides[k] = v
+
+	if 'engine' not in overrides:
+		overrides['engine'] = detect_engine()
+
+	packages_path = os.path.join(work_dir, 'Packages')
+	project_dir = os.path.join(work_dir, 'project')
+	os.makedirs(packages_path)
+	os.makedirs(project_dir)
+	project_file = create_project(project_dir)
+
+	sublime = fakesublime.install(packages_path, os.path.join(work_dir, 'Cache'), overrides)
+	sys.path.insert(0, BASE_PATH)
+
+	window = sublime.Window(project_file)
+	main_view = window.open_file(os.path.join(project_dir, 'main.js'))
+
+	import tern
+	listener = tern.TernJSEventListener()
+	tern.plugin_loaded()
+	sublime.run_timeouts()
+	if not tern.can_run():
+		print('TernJS engine is not available')
+		return 1
+
+	listener.on_load(main_view)
+	sublime.run_timeouts()
+
+	failed = []
+	def check(title, passed, details=''):
+		print('%s %s%s' % ('OK  ' if passed else 'FAIL', title, details and ': %s' % details))
+		if not passed:
+			failed.append(title)
+
+	check('Completions of required module', 'hello' in complete(listener, main_view, 'b.'))
+
+	info = json.loads(tern.ctx.call('memoryInfo'))['servers'][project_file]
+	symbols = json.loads(tern.ctx.call('ternSymbols', project_file, '', 0))
+	files = sorted(set(s['file'] for s in symbols))
+	check('Modules are analyzed once, under project file names',
+		info['files'] == len(FILES) and set(files) <= set(FILES), '%d files, symbols of %s' % (info['files'], ', '.join(files)))
+
+	def reanalyzed():
+		return json.loads(tern.ctx.call('queryStats'))['reanalysis']['files']
+
+	before = reanalyzed()
+	b_path = os.path.join(project_dir, 'b.js')
+	with open(b_path, 'w') as f:
+		f.write('exports.greet = function() { return 1; };\n')
+	b_view = window.open_file(b_path)
+	listener.on_load(b_view)
+	listener.on_post_save(b_view)
+	sublime.run_timeouts()
+
+	count = reanalyzed() - before
+	check('Saving b.js re-analyzes its dependents', count >= 2, '%d files' % count)
+
+	names = complete(listener, main_view, 'b.')
+	check('Dependents see changed exports', 'greet' in names and 'hello' not in names, ', '.join(names))
+
+	tern.plugin_unloaded()
+
+	return 1 if failed else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
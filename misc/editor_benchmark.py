@@ -0,0 +1,245 @@
+"""
+Headless end-to-end benchmark of TernJS plugin.
+
+Loads `tern.py` with fake `sublime` modules (see `fakesublime.py`)
+against a synthetic or real project and scripts typing sessions:
+member expressions are typed char by char into a project file with
+completions queried after each char, then definition and references
+of typed member are looked up. Each round restarts project servers,
+so first completion of a round is a cold one.
+
+Reports startup time, cold and warm latency distributions and memory.
+Uses PyV8 engine when PyV8 binary can be imported, otherwise
+falls back to Node.js engine.
+
+Usage:
+	python misc/editor_benchmark.py [--files 200] [--rounds 3]
+	python misc/editor_benchmark.py --project path/to/app.sublime-project --file src/app.js
+	python misc/editor_benchmark.py --set warm_start=false --set engine=node
+"""
+import sys
+import os
+import os.path
+import re
+import json
+import time
+import shutil
+import tempfile
+import argparse
+
+BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakesublime
+
+def percentile(values, p):
+	if not values:
+		return 0
+	values = sorted(values)
+	return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+def distribution(name, values):
+	if not values:
+		return '%-12s %6s' % (name, 'n/a')
+	return '%-12s %6d samples, min %7.1f, median %7.1f, p90 %7.1f, max %7.1f ms' % (name,
+		len(values), min(values), percentile(values, 50), percentile(values, 90), max(values))
+
+def timed(fn, *args):
+	"Calls given function, returns its result and elapsed time in ms"
+	started = time.time()
+	result = fn(*args)
+	return result, (time.time() - started) * 1000
+
+def measure(samples, errors, fn, *args):
+	"Adds time of given function call to samples, failed calls to errors"
+	started = time.time()
+	try:
+		fn(*args)
+	except Exception as e:
+		errors.append(str(e).splitlines()[0])
+		return
+	samples.append((time.time() - started) * 1000)
+	fakesublime.run_timeouts()
+
+def create_project(target_dir, file_count):
+	"""
+	Generates synthetic project: modules that define objects with
+	functions calling functions of other modules
+	"""
+	for i in range(file_count):
+		lines = ['var mod%d = {};' % i]
+		for j in range(10):
+			dep = (i + j) % file_count
+			lines.append('mod%d.fn%d = function(a, b) { var o = {x: a, y: [b, "s%d"]}; return o.x + mod%d.fn%d(o.y, a); };' % (i, j, j, dep, j))
+		with open(os.path.join(target_dir, 'f%03d.js' % i), 'w') as f:
+			f.write('\n'.join(lines) + '\n')
+
+	with open(os.path.join(target_dir, 'main.js'), 'w') as f:
+		f.write('var result = mod0.fn0(1, 2);\n')
+
+	project_file = os.path.join(target_dir, 'bench.sublime-project')
+	with open(project_file, 'w') as f:
+		json.dump({'folders': [{'path': '.'}], 'ternjs': {}}, f)
+
+	members = ['mod%d.fn%d' % ((i * 37) % file_count, i % 10) for i in range(5)]
+	return project_file, 'main.js', members
+
+def member_expressions(text, limit=5):
+	"Returns member expressions used in given JS source"
+	result = []
+	for m in re.finditer(r'(?<![\w$.])([A-Za-z_$][\w$]*)\.([A-Za-z_$][\w$]*)', text):
+		expr = m.group(0)
+		if expr not in result:
+			result.append(expr)
+		if len(result) >= limit:
+			break
+	return result
+
+def detect_engine():
+	try:
+		import PyV8
+		return 'pyv8'
+	except ImportError:
+		return 'node'
+
+def main():
+	parser = argparse.ArgumentParser(description='Headless TernJS plugin benchmark')
+	parser.add_argument('--project', help='.sublime-project file of real project')
+	parser.add_argument('--file', help='project file to type into, relative to project folder')
+	parser.add_argument('--files', type=int, default=200, help='number of files in synthetic project')
+	parser.add_argument('--rounds', type=int, default=3, help='number of server restarts')
+	parser.add_argument('--type', action='append', dest='members', help='member expression to type, e.g. "app.start"')
+	parser.add_argument('--set', action='append', default=[], help='override plugin setting, e.g. engine=node')
+	args = parser.parse_args()
+
+	work_dir = tempfile.mkdtemp(prefix='ternjs-bench-')
+	try:
+		return run(args, work_dir)
+	finally:
+		shutil.rmtree(work_dir, ignore_errors=True)
+
+def run(args, work_dir):
+	overrides = {}
+	for item in args.set:
+		k, v = item.split('=', 1)
+		try:
+			v = json.loads(v)
+		except ValueError:
+			pass
+		overrides[k] = v
+
+	if 'engine' not in overrides:
+		overrides['engine'] = detect_engine()
+
+	packages_path = os.path.join(work_dir, 'Packages')
+	cache_path = os.path.join(work_dir, 'Cache')
+	os.makedirs(packages_path)
+
+	if args.project:
+		project_file = os.path.abspath(args.project)
+		with open(os.path.join(os.path.dirname(project_file), args.file)) as f:
+			members = args.members or member_expressions(f.read())
+		file_name = args.file
+	else:
+		project_dir = os.path.join(work_dir, 'project')
+		os.makedirs(project_dir)
+		project_file, file_name, members = create_project(project_dir, args.files)
+		members = args.members or members
+
+	if not members:
+		print('No member expressions to type, use --type option')
+		return 1
+
+	sublime = fakesublime.install(packages_path, cache_path, overrides)
+	sys.path.insert(0, BASE_PATH)
+
+	if overrides['engine'] == 'pyv8':
+		# don't let PyV8 loader check for updates
+		import ternjs.pyv8loader as pyv8loader
+		pyv8loader.save_loader_config(os.path.join(packages_path, 'PyV8', pyv8loader.get_arch()),
+			{'skip_update': True, 'last_id': 0, 'last_update': time.time()})
+
+	window = sublime.Window(project_file)
+	file_path = os.path.join(os.path.dirname(project_file), file_name)
+	view = window.open_file(file_path)
+
+	_, import_time = timed(__import__, 'tern')
+	tern = sys.modules['tern']
+	listener = tern.TernJSEventListener()
+
+	print('Engine: %s, project: %s, typing into %s' % (overrides['engine'], project_file, file_name))
+
+	startup = []
+	cold = []
+	warm = []
+	definitions = []
+	references = []
+	errors = []
+
+	for i in range(args.rounds):
+		if i == 0:
+			_, elapsed = timed(tern.plugin_loaded)
+		else:
+			_, elapsed = timed(tern.reload_ternjs)
+		sublime.run_timeouts()
+		startup.append(elapsed)
+
+		if not tern.can_run():
+			print('TernJS engine is not available')
+			return 1
+
+		# fresh copy of file for each round
+		window._views.remove(view)
+		view = window.open_file(file_path)
+		listener.on_load(view)
+		sublime.run_timeouts()
+
+		first = True
+		for member in members:
+			view.move_to(view.size())
+			view.type('\n')
+			for ch in member:
+				view.type(ch)
+				pos = view.sel()[0].begin()
+				word = view.word(pos)
+				measure(cold if first else warm, errors, listener.on_query_completions, view, view.substr(word), [pos])
+				first = False
+
+			# look up typed member
+			view.move_to(view.size() - 1)
+			measure(definitions, errors, tern.TernjsJumpToDefinition(view).run, None)
+			window.focus_view(view)
+			measure(references, errors, tern.TernjsNextOccurance(view).run, None)
+
+	print('')
+	print('Plugin import %8.1f ms' % import_time)
+	print(distribution('Startup', startup))
+	print(distribution('Cold', cold))
+	print(distribution('Warm', warm))
+	print(distribution('Definition', definitions))
+	print(distribution('References', references))
+
+	if errors:
+		print('Failed       %6d queries, e.g. %s' % (len(errors), errors[0]))
+
+	heap = tern.ctx.heap_statistics()
+	if heap:
+		print('JS heap      %8.1f MB used of %.1f MB' % (heap['used_heap_size'] / 1048576.0, heap['total_heap_size'] / 1048576.0))
+
+	try:
+		# PyV8 engine runs in Python process, so its memory is included
+		import resource
+		print('Python RSS   %8.1f MB max' % (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0))
+	except ImportError:
+		pass
+
+	usage = hasattr(tern.ctx, 'memory_usage') and tern.ctx.memory_usage()
+	if usage:
+		print('Worker RSS   %8.1f MB' % (usage['rss'] / 1048576.0))
+
+	tern.plugin_unloaded()
+
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
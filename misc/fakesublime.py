@@ -0,0 +1,312 @@
+"""
+Minimal stand-in for Sublime Text `sublime` and `sublime_plugin` modules,
+enough to load `tern.py` outside of editor: views with text and
+selection, windows, settings and deferred callbacks.
+
+Usage:
+	import fakesublime
+	fakesublime.install(packages_path, cache_path)
+	import tern
+"""
+import sys
+import os.path
+import re
+import json
+import types
+
+HIDDEN = 128
+
+_packages_path = None
+_cache_path = None
+_settings = {}
+_windows = []
+_timeouts = []
+_buffer_ids = [0]
+
+def install(packages_path, cache_path, settings_overrides=None):
+	"Registers fake `sublime` and `sublime_plugin` modules"
+	globals()['_packages_path'] = packages_path
+	globals()['_cache_path'] = cache_path
+
+	base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+	settings = load_settings('TernJS.sublime-settings')
+	settings.update(read_settings_file(os.path.join(base_path, 'TernJS.sublime-settings')))
+	settings.update(settings_overrides or {})
+
+	sublime = sys.modules[__name__]
+	plugin = types.ModuleType('sublime_plugin')
+	for cls in [EventListener, TextCommand, WindowCommand, ApplicationCommand]:
+		setattr(plugin, cls.__name__, cls)
+
+	sys.modules['sublime'] = sublime
+	sys.modules['sublime_plugin'] = plugin
+	return sublime
+
+def read_settings_file(file_path):
+	"Reads JSON settings file with comments"
+	with open(file_path) as f:
+		text = f.read()
+	text = re.sub(r'^\s*//.*$', '', text, flags=re.M)
+	return json.loads(text)
+
+def version():
+	return '3083'
+
+def platform():
+	return sys.platform
+
+def arch():
+	return 'x64'
+
+def packages_path():
+	return _packages_path
+
+def installed_packages_path():
+	return os.path.join(os.path.dirname(_packages_path), 'Installed Packages')
+
+def cache_path():
+	return _cache_path
+
+def set_timeout(callback, delay=0):
+	_timeouts.append(callback)
+
+def run_timeouts():
+	"Runs callbacks scheduled with `set_timeout()`, returns their number"
+	count = 0
+	while _timeouts:
+		_timeouts.pop(0)()
+		count += 1
+	return count
+
+def status_message(message):
+	pass
+
+def error_message(message):
+	print('Error: %s' % message)
+
+def windows():
+	return list(_windows)
+
+def active_window():
+	return _windows[-1] if _windows else None
+
+def load_settings(name):
+	if name not in _settings:
+		_settings[name] = Settings()
+	return _settings[name]
+
+class Settings(dict):
+	def has(self, key):
+		return key in self
+
+	def set(self, key, value):
+		self[key] = value
+
+	def erase(self, key):
+		self.pop(key, None)
+
+class Region(object):
+	def __init__(self, a, b=None):
+		self.a = a
+		self.b = a if b is None else b
+
+	def begin(self):
+		return min(self.a, self.b)
+
+	def end(self):
+		return max(self.a, self.b)
+
+	def size(self):
+		return self.end() - self.begin()
+
+	def empty(self):
+		return self.a == self.b
+
+	def contains(self, x):
+		if isinstance(x, Region):
+			return self.begin() <= x.begin() and x.end() <= self.end()
+		return self.begin() <= x <= self.end()
+
+	def __eq__(self, other):
+		return isinstance(other, Region) and self.a == other.a and self.b == other.b
+
+	def __repr__(self):
+		return '(%d, %d)' % (self.a, self.b)
+
+class Selection(list):
+	def clear(self):
+		del self[:]
+
+	def add(self, region):
+		self.append(region)
+
+class View(object):
+	def __init__(self, window, file_name=None, text=''):
+		_buffer_ids[0] += 1
+		self._window = window
+		self._file_name = file_name
+		self._buffer_id = _buffer_ids[0]
+		self._text = text
+		self._dirty = False
+		self._change_count = 0
+		self._sel = Selection([Region(0)])
+		self._regions = {}
+		self._settings = Settings()
+
+	def id(self):
+		return self._buffer_id
+
+	def file_name(self):
+		return self._file_name
+
+	def buffer_id(self):
+		return self._buffer_id
+
+	def window(self):
+		return self._window
+
+	def settings(self):
+		return self._settings
+
+	def is_loading(self):
+		return False
+
+	def is_dirty(self):
+		return self._dirty
+
+	def change_count(self):
+		return self._change_count
+
+	def size(self):
+		return len(self._text)
+
+	def substr(self, x):
+		if isinstance(x, Region):
+			return self._text[x.begin():x.end()]
+		return self._text[x:x + 1]
+
+	def sel(self):
+		return self._sel
+
+	def word(self, x):
+		pt = x.begin() if isinstance(x, Region) else x
+		start = end = pt
+		while start > 0 and re.match(r'[\w$]', self._text[start - 1]):
+			start -= 1
+		while end < len(self._text) and re.match(r'[\w$]', self._text[end]):
+			end += 1
+		return Region(start, end)
+
+	def score_selector(self, pt, selector):
+		if 'source.js' in selector:
+			return 1 if (self._file_name or '').endswith('.js') else 0
+		return 1
+
+	def add_regions(self, key, regions, scope='', icon='', flags=0):
+		self._regions[key] = list(regions)
+
+	def get_regions(self, key):
+		return self._regions.get(key, [])
+
+	def erase_regions(self, key):
+		self._regions.pop(key, None)
+
+	def show(self, x, *args):
+		pass
+
+	def run_command(self, cmd, args=None):
+		if cmd == 'append':
+			self.insert(len(self._text), args['characters'])
+
+	def insert(self, pt, text):
+		"Inserts text at given point, moves caret after it"
+		self._text = self._text[:pt] + text + self._text[pt:]
+		self._dirty = True
+		self._change_count += 1
+		self._sel = Selection([Region(pt + len(text))])
+
+	def type(self, text):
+		"Inserts text at caret, as if it was typed"
+		self.insert(self._sel[0].begin(), text)
+
+	def move_to(self, pt):
+		self._sel = Selection([Region(pt)])
+
+class Window(object):
+	def __init__(self, project_file=None):
+		self._project_file = project_file
+		self._views = []
+		self._active = None
+		self.panels = {}
+		self.quick_panel = None
+		_windows.append(self)
+
+	def project_file_name(self):
+		return self._project_file
+
+	def views(self):
+		return list(self._views)
+
+	def active_view(self):
+		return self._active
+
+	def focus_view(self, view):
+		self._active = view
+
+	def find_open_file(self, file_name):
+		for v in self._views:
+			if v.file_name() == file_name:
+				return v
+		return None
+
+	def open_file(self, file_name, flags=0):
+		view = self.find_open_file(file_name)
+		if not view:
+			with open(file_name) as f:
+				view = View(self, file_name, f.read())
+			self._views.append(view)
+		self._active = view
+		return view
+
+	def close_view(self, view):
+		"Closes given view, returns `False` if it's not opened in window"
+		if view not in self._views:
+			return False
+		self._views.remove(view)
+		if self._active is view:
+			self._active = self._views[-1] if self._views else None
+		return True
+
+	def new_file(self):
+		view = View(self)
+		self._views.append(view)
+		self._active = view
+		return view
+
+	def get_output_panel(self, name):
+		if name not in self.panels:
+			self.panels[name] = View(self)
+		return self.panels[name]
+
+	def show_quick_panel(self, items, on_select, flags=0, selected_index=-1, on_highlight=None):
+		self.quick_panel = (items, on_select)
+
+	def show_input_panel(self, caption, initial_text, on_done, on_change, on_cancel):
+		on_done(initial_text)
+
+	def run_command(self, cmd, args=None):
+		pass
+
+class EventListener(object):
+	pass
+
+class TextCommand(object):
+	def __init__(self, view):
+		self.view = view
+
+class WindowCommand(object):
+	def __init__(self, window):
+		self.window = window
+
+class ApplicationCommand(object):
+	pass
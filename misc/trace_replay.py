@@ -0,0 +1,198 @@
+"""
+Replays bridge calls recorded with `trace_dir` setting (see
+`ternjs/tracing.py`) against a fresh TernJS context and reports
+per-query latency.
+
+Files recorded in trace are restored into a temporary folder and
+project paths in calls are mapped to it, so calls see the same
+project state as during recording. Without `--against`, replayed
+latencies are compared with recorded ones; with it, trace is replayed
+with both plugin versions, each in its own process.
+
+Usage:
+	python misc/trace_replay.py TRACE.jsonl [--engine node] [--against path/to/other/TernJS]
+"""
+import sys
+import os
+import os.path
+import json
+import time
+import codecs
+import shutil
+import tempfile
+import argparse
+import subprocess
+
+BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def percentile(values, p):
+	if not values:
+		return 0
+	values = sorted(values)
+	return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+class PathMapper():
+	"Maps absolute paths of recording machine into replay folder"
+	def __init__(self, root):
+		self.root = root
+		self.dirs = []
+
+	def add_dir(self, d):
+		if d and os.path.isabs(d) and d not in self.dirs:
+			self.dirs.append(d)
+			self.dirs.sort(key=len, reverse=True)
+
+	def map(self, p):
+		return os.path.join(self.root, os.path.splitdrive(p)[1].lstrip('/\\'))
+
+	def rewrite(self, value):
+		if isinstance(value, dict):
+			return dict((k, self.rewrite(v)) for k, v in value.items())
+		if isinstance(value, list):
+			return [self.rewrite(v) for v in value]
+		if hasattr(value, 'encode'):
+			for d in self.dirs:
+				if value.startswith(d):
+					return self.map(value)
+		return value
+
+def restore(records, store, mapper):
+	"Restores recorded files and collects project folders"
+	for r in records:
+		if r['method'] == 'startServer':
+			project = r['args'][0].get('$json', {})
+			mapper.add_dir(project.get('dir'))
+			mapper.add_dir(os.path.dirname(project.get('id', '')))
+
+	for r in records:
+		for file_path, key in (r.get('files') or {}).items():
+			target = mapper.map(file_path)
+			if not os.path.exists(os.path.dirname(target)):
+				os.makedirs(os.path.dirname(target))
+			with codecs.open(target, 'w', 'utf-8') as f:
+				f.write(store.get(key))
+
+def unpack_args(args, store, mapper, tracing):
+	result = []
+	for a in args:
+		if isinstance(a, dict) and '$json' in a:
+			result.append(json.dumps(mapper.rewrite(tracing.unpack(a['$json'], store)), ensure_ascii=False))
+		else:
+			result.append(mapper.rewrite(tracing.unpack(a, store)))
+	return result
+
+def read_file(name, proj=None):
+	"Plain file reader for PyV8 engine, a counterpart of `readFile()` from worker.js"
+	file_path = name
+	if not os.path.isabs(file_path) and proj and proj['dir']:
+		file_path = os.path.join(proj['dir'], file_path)
+
+	for ext in ['', '.js', '.json']:
+		if os.path.isfile(file_path + ext):
+			with codecs.open(file_path + ext, 'r', 'utf-8') as f:
+				return f.read()
+
+	return None
+
+def replay(trace_path, plugin_path, engine):
+	"Replays given trace with plugin at given path, returns list of call timings"
+	sys.path.insert(0, os.path.join(plugin_path, 'ternjs'))
+	sys.path.insert(0, os.path.join(BASE_PATH, 'ternjs'))
+	import tracing
+	sys.path.pop(0)
+
+	records = [r for r in tracing.read_trace(trace_path) if 'method' in r]
+	store = tracing.BlobStore(os.path.join(os.path.dirname(trace_path), 'blobs'))
+	root = tempfile.mkdtemp(prefix='ternjs-replay-')
+	mapper = PathMapper(root)
+
+	try:
+		restore(records, store, mapper)
+		if engine == 'node':
+			import rpc
+			ctx = rpc.WorkerContext(contrib={})
+		else:
+			import context
+			ctx = context.Context(contrib={'sublimeReadFile': read_file})
+
+		result = []
+		for r in records:
+			args = unpack_args(r['args'], store, mapper, tracing)
+			started = time.time()
+			error = None
+			try:
+				ctx.call(r['method'], *args)
+			except Exception as e:
+				error = str(e).splitlines()[0]
+
+			result.append({
+				'seq': r['seq'],
+				'method': r['method'],
+				'query': r.get('query'),
+				'recorded': r['elapsed'],
+				'elapsed': (time.time() - started) * 1000,
+				'error': error
+			})
+
+		if engine == 'node':
+			ctx.reset()
+		return result
+	finally:
+		shutil.rmtree(root, ignore_errors=True)
+
+def replay_in_process(trace_path, plugin_path, engine):
+	"Replays trace in separate process, so plugin modules don't mix"
+	out = subprocess.check_output([sys.executable, os.path.abspath(__file__), trace_path,
+		'--plugin', plugin_path, '--engine', engine, '--json'])
+	return json.loads(out.decode('utf-8').strip().splitlines()[-1])
+
+def call_name(r):
+	return r['query'] and '%s:%s' % (r['method'], r['query']) or r['method']
+
+def report(base, other, base_title, other_title):
+	print('%6s  %-24s %10s %10s %10s' % ('seq', 'call', base_title, other_title, 'diff'))
+	groups = {}
+	for a, b in zip(base, other):
+		name = call_name(a)
+		diff = b['elapsed'] - a['elapsed']
+		groups.setdefault(name, []).append((a['elapsed'], b['elapsed']))
+		note = b['error'] or a['error'] or ''
+		print('%6d  %-24s %10.1f %10.1f %+10.1f %s' % (a['seq'], name, a['elapsed'], b['elapsed'], diff, note))
+
+	print('')
+	print('%-24s %6s %12s %12s %8s' % ('call', 'count', base_title + ' p50', other_title + ' p50', 'total'))
+	for name in sorted(groups):
+		pairs = groups[name]
+		a_total = sum(p[0] for p in pairs)
+		b_total = sum(p[1] for p in pairs)
+		change = (b_total - a_total) * 100.0 / a_total if a_total else 0
+		print('%-24s %6d %12.1f %12.1f %+7.1f%%' % (name, len(pairs),
+			percentile([p[0] for p in pairs], 50), percentile([p[1] for p in pairs], 50), change))
+
+def main():
+	parser = argparse.ArgumentParser(description='Replay of recorded TernJS bridge calls')
+	parser.add_argument('trace', help='trace file recorded by plugin')
+	parser.add_argument('--engine', default='node', choices=['node', 'pyv8'])
+	parser.add_argument('--plugin', default=BASE_PATH, help='plugin folder to replay trace with')
+	parser.add_argument('--against', help='folder of other plugin version to compare with')
+	parser.add_argument('--json', action='store_true', help='print timings as JSON')
+	args = parser.parse_args()
+	trace_path = os.path.abspath(args.trace)
+
+	if args.json:
+		print(json.dumps(replay(trace_path, os.path.abspath(args.plugin), args.engine)))
+		return 0
+
+	if args.against:
+		base = replay_in_process(trace_path, os.path.abspath(args.plugin), args.engine)
+		other = replay_in_process(trace_path, os.path.abspath(args.against), args.engine)
+		report(base, other, 'base', 'other')
+	else:
+		result = replay_in_process(trace_path, os.path.abspath(args.plugin), args.engine)
+		recorded = [dict(r, elapsed=r['recorded'], error=None) for r in result]
+		report(recorded, result, 'recorded', 'replayed')
+
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
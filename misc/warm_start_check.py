@@ -0,0 +1,144 @@
+"""
+Headless check of editing files of warm-started server.
+
+Loads `tern.py` with fake `sublime` modules (see `fakesublime.py`),
+analyzes a small project, restarts its server from condensed state
+(warm start), then renames symbols of `util.js` and saves it the way
+editor does. Checks that completions and symbol index no longer
+contain old symbols of `util.js`, which come from condensed state,
+and that state saved after the edit still describes other files.
+
+Exits with non-zero code if any check fails.
+
+Usage:
+	python misc/warm_start_check.py [--set engine=node]
+"""
+import sys
+import os
+import os.path
+import json
+import shutil
+import tempfile
+import argparse
+
+BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakesublime
+from editor_benchmark import detect_engine
+from dependents_check import complete
+
+UTIL_TEXT = 'var util = {oldFn: function(x) { return x; }};\nfunction oldTop(a) { return a; }\n'
+UTIL_CHANGED = 'var util = {newFn: function(y) { return y; }};\nfunction newTop(b) { return b; }\n'
+
+def create_project(target_dir):
+	files = {
+		'util.js': UTIL_TEXT,
+		'main.js': 'var value = util.oldFn(1);\n'
+	}
+	# warm start is used only if few project files are changed
+	for i in range(10):
+		files['lib%d.js' % i] = 'var lib%d = {run: function() { return %d; }};\n' % (i, i)
+
+	for name, text in files.items():
+		with open(os.path.join(target_dir, name), 'w') as f:
+			f.write(text)
+
+	project_file = os.path.join(target_dir, 'warm.sublime-project')
+	with open(project_file, 'w') as f:
+		json.dump({'folders': [{'path': '.'}], 'ternjs': {}}, f)
+
+	return project_file
+
+def main():
+	parser = argparse.ArgumentParser(description='Headless check of edits of warm-started files')
+	parser.add_argument('--set', action='append', default=[], help='override plugin setting, e.g. engine=node')
+	args = parser.parse_args()
+
+	work_dir = tempfile.mkdtemp(prefix='ternjs-warm-')
+	try:
+		return run(args, work_dir)
+	finally:
+		shutil.rmtree(work_dir, ignore_errors=True)
+
+def run(args, work_dir):
+	overrides = {'warm_start': True}
+	for item in args.set:
+		k, v = item.split('=', 1)
+		try:
+			v = json.loads(v)
+		except ValueError:
+			pass
+		overrides[k] = v
+
+	if 'engine' not in overrides:
+		overrides['engine'] = detect_engine()
+
+	packages_path = os.path.join(work_dir, 'Packages')
+	project_dir = os.path.join(work_dir, 'project')
+	os.makedirs(packages_path)
+	os.makedirs(project_dir)
+	project_file = create_project(project_dir)
+
+	sublime = fakesublime.install(packages_path, os.path.join(work_dir, 'Cache'), overrides)
+	sys.path.insert(0, BASE_PATH)
+
+	window = sublime.Window(project_file)
+	main_view = window.open_file(os.path.join(project_dir, 'main.js'))
+
+	import tern
+	listener = tern.TernJSEventListener()
+	tern.plugin_loaded()
+	sublime.run_timeouts()
+	if not tern.can_run():
+		print('TernJS engine is not available')
+		return 1
+
+	listener.on_load(main_view)
+	sublime.run_timeouts()
+
+	failed = []
+	def check(title, passed, details=''):
+		print('%s %s%s' % ('OK  ' if passed else 'FAIL', title, details and ': %s' % details))
+		if not passed:
+			failed.append(title)
+
+	# analyze project, then restart server from its condensed state
+	complete(listener, main_view, 'util.')
+	tern.reload_ternjs()
+	sublime.run_timeouts()
+	check('Server is warm-started', 'util.js' in tern.state_store.warm_files(project_file))
+
+	names = complete(listener, main_view, 'util.')
+	check('Completions of warm-started file', 'oldFn' in names, ', '.join(names))
+
+	util_path = os.path.join(project_dir, 'util.js')
+	with open(util_path, 'w') as f:
+		f.write(UTIL_CHANGED)
+	util_view = window.open_file(util_path)
+	listener.on_load(util_view)
+	listener.on_post_save(util_view)
+	sublime.run_timeouts()
+
+	names = complete(listener, main_view, 'util.')
+	check('Completions see changes of warm-started file', 'newFn' in names and 'oldFn' not in names, ', '.join(names))
+
+	names = complete(listener, main_view, '')
+	check('Removed top-level symbols are not completed', 'newTop' in names and 'oldTop' not in names)
+
+	symbols = [s['name'] for s in json.loads(tern.ctx.call('ternSymbols', project_file, '', 0)) if s['file'] == 'util.js']
+	check('Symbol index has no old symbols', 'newTop' in symbols and 'oldTop' not in symbols, ', '.join(symbols))
+
+	# state saved with edited file keeps types of other warm files
+	tern.reload_ternjs()
+	sublime.run_timeouts()
+	names = complete(listener, main_view, 'lib0.')
+	warm = 'lib0.js' in tern.state_store.warm_files(project_file)
+	check('Saved state keeps other warm-started files', warm and 'run' in names, ', '.join(names))
+
+	tern.plugin_unloaded()
+
+	return 1 if failed else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -1,10 +1,11 @@
 import sys
 import os.path
 import imp
-import re
 import json
+import time
 import threading
 import fnmatch
+import re
 from copy import copy
 
 import sublime, sublime_plugin
@@ -22,11 +23,72 @@ import ternjs.pyv8loader as pyv8loader
 import ternjs.tern_plugin as plugin
 import ternjs.project as project
 import ternjs.context as ternjs
+import ternjs.rpc as rpc
+import ternjs.watchdog as watchdog
+import ternjs.persist as persist
+import ternjs.depdefs as depdefs
+import ternjs.filecache as filecache
+import ternjs.deadline as deadline
+import ternjs.stats as stats
+import ternjs.tracing as tracing
+import ternjs.memory as memory
+import ternjs.lifecycle as lifecycle
+import ternjs.warmup as warmup
+import ternjs.vendor as vendor
+import ternjs.completion as completion
+from ternjs.completion import completion_item
+from ternjs.lru import LRUCache
 from ternjs.context import js_file_reader as _js_file_reader
 
 # JS context
 ctx = None
 
+# Memory budget watchdog for TernJS servers
+server_watchdog = None
+
+# Condensed project states for warm start
+state_store = None
+
+# Precomputed defs of npm dependencies
+dependency_defs = None
+
+# Queue of npm dependencies which defs are being generated
+dependency_queue = None
+
+# Copies of known libraries in project files
+vendor_detector = None
+
+# Contents of project files, read ahead for TernJS
+file_cache = None
+
+# Text of recently queried views by buffer id, with change count
+# it was taken at
+view_texts = LRUCache(32)
+
+# Change counts of dirty views which text is known to project
+# servers, by project id and file name
+synced_versions = LRUCache(1000)
+
+# Views loaded since last project sync, see `queue_sync()`
+_loaded_views = []
+
+# Views referencing every project, see `track_view()`
+project_lifecycle = None
+
+# Idle-time analysis of started servers
+warm_up = None
+_warm_up_timer = False
+
+# Periodic memory sampler, see `sample_memory()`
+memory_sampler = None
+
+# Phase timings of TernJS requests
+phase_stats = stats.PhaseStats()
+
+# Project files excluded from analysis because TernJS
+# was terminated while processing them
+excluded_files = {}
+
 # Default ST settings
 user_settings = None
 
@@ -35,22 +97,64 @@ _rename_session = None
 
 rename_region_key = 'ternjs-rename-region'
 
-icons = {
-	'object':  '{}',
-	'array':   '[]',
-	'number':  '(num)',
-	'string':  '(str)',
-	'bool':    '(bool)',
-	'fn':      'fn()',
-	'unknown': '(?)'
-}
-
 def is_st3():
 	return sublime.version()[0] == '3'
 
 def init():
 	globals()['user_settings'] = sublime.load_settings('Preferences.sublime-settings')
 	globals()['settings'] = sublime.load_settings('TernJS.sublime-settings')
+	globals()['state_store'] = persist.StateStore(os.path.join(cache_path(), 'projects'),
+		logger=SublimeLoaderDelegate().log)
+	globals()['dependency_defs'] = depdefs.DependencyDefs(os.path.join(cache_path(), 'node_modules'),
+		generate=condense_package,
+		logger=SublimeLoaderDelegate().log)
+	globals()['dependency_queue'] = depdefs.GenerationQueue(dependency_defs, on_ready=add_dependency_defs)
+	globals()['vendor_detector'] = vendor.VendorDetector(settings.get('vendored_libs', {}))
+	globals()['file_cache'] = filecache.FileCache(
+		max_size=settings.get('file_cache_size', 64) * 1024 * 1024,
+		workers=settings.get('file_prefetch_threads', 4),
+		reader=_js_file_reader)
+
+	globals()['project_lifecycle'] = lifecycle.ProjectLifecycle(settings.get('server_grace_period', 300))
+
+	contrib = {
+		'sublimeReadFile': ternjs_file_reader,
+		'sublimeGetFileNameFromView': file_name_from_view,
+		'sublimeViewContents': view_contents
+	}
+
+	if settings.get('memory_tracing', False):
+		memory.start_tracing()
+
+	globals()['memory_sampler'] = memory.MemorySampler(os.path.join(cache_path(), 'memory.log'))
+	interval = settings.get('memory_sample_interval', 0)
+	if interval:
+		sublime.set_timeout(sample_memory, int(interval * 1000))
+
+	tracer = None
+	if settings.get('trace_dir'):
+		# record bridge calls for replay
+		tracer = tracing.Tracer(os.path.expanduser(settings.get('trace_dir')),
+			logger=SublimeLoaderDelegate().log)
+		contrib['sublimeReadFile'] = tracer.wrap_reader(ternjs_file_reader)
+
+	if settings.get('engine') == 'node':
+		# run TernJS in a separate Node.js process
+		globals()['ctx'] = rpc.WorkerContext(
+			node=settings.get('node_path', 'node'),
+			timeout=settings.get('worker_timeout', 10),
+			reader=js_file_reader,
+			contrib=contrib,
+			logger=SublimeLoaderDelegate().log,
+			on_restart=lambda: sublime.set_timeout(sync_all_projects, 0)
+		)
+		ctx.tracer = tracer
+		create_watchdog()
+		create_warm_up()
+
+		if can_run():
+			sync_all_projects()
+		return
 
 	# setup environment for PyV8 loading
 	pyv8_paths = [
@@ -65,24 +169,95 @@ def init():
 	for p in pyv8_paths:
 		pyv8loader.unpack_pyv8(p)
 
-	contrib = {
-		'sublimeReadFile': ternjs_file_reader,
-		'sublimeGetFileNameFromView': file_name_from_view,
-		'sublimeViewContents': view_contents
-	}
-
 	delegate = SublimeLoaderDelegate()
 	globals()['ctx'] = ternjs.Context(
 		reader=js_file_reader,
 		contrib=contrib,
 		logger=delegate.log
 	)
+	ctx.tracer = tracer
+	create_watchdog()
+	create_warm_up()
 
 	pyv8loader.load(pyv8_paths[1], delegate) 
 
 	if can_run():
 		sync_all_projects()
 
+def cache_path():
+	"Returns path to folder where TernJS keeps its caches"
+	if hasattr(sublime, 'cache_path'):
+		return os.path.join(sublime.cache_path(), 'TernJS')
+	return os.path.join(PACKAGES_PATH, 'User', 'TernJS.cache')
+
+def sample_memory():
+	"Writes memory sample into log and schedules next one"
+	interval = settings.get('memory_sample_interval', 0)
+	if not memory_sampler or not interval:
+		return
+
+	if can_run():
+		try:
+			servers = json.loads(ctx.call('serverInfo'))
+			memory_sampler.sample(ctx.heap_statistics(), servers)
+		except Exception as e:
+			print('TernJS: unable to sample memory: %s' % e)
+
+	sublime.set_timeout(sample_memory, int(interval * 1000))
+
+def create_warm_up():
+	if not settings.get('warm_up', True):
+		return
+
+	def on_warm(project_id, files, elapsed):
+		if files:
+			message = 'TernJS: %s is ready, %d files analyzed in %.1f s' % (os.path.basename(project_id), files, elapsed)
+			print(message)
+			sublime.set_timeout(lambda: sublime.status_message(message), 0)
+
+	def on_overrun(project_id):
+		proj = [p for p in all_projects() if p['id'] == project_id]
+		handle_overrun(proj[0] if proj else {'id': project_id})
+
+	globals()['warm_up'] = warmup.WarmUpScheduler(ctx,
+		time_slice=settings.get('warm_up_slice', 50),
+		on_warm=on_warm,
+		logger=SublimeLoaderDelegate().log,
+		kill_timeout=settings.get('query_kill_timeout', 0) / 1000.0,
+		on_overrun=on_overrun)
+	if is_st3():
+		warm_up.start()
+
+def schedule_warm_up(project_id):
+	if not warm_up:
+		return
+
+	warm_up.schedule(project_id)
+	if not is_st3() and not _warm_up_timer:
+		# ST2 API is not thread-safe, slices are run from editor timer
+		globals()['_warm_up_timer'] = True
+		sublime.set_timeout(run_warm_up, 100)
+
+def run_warm_up():
+	if warm_up and warm_up.step():
+		sublime.set_timeout(run_warm_up, 50)
+	else:
+		globals()['_warm_up_timer'] = False
+
+def create_watchdog():
+	globals()['server_watchdog'] = watchdog.ServerWatchdog(ctx,
+		budget=settings.get('memory_budget', 0),
+		logger=SublimeLoaderDelegate().log,
+		stop=evict_project)
+
+def evict_project(project_id):
+	"Stops server of given project to free memory, keeping its state for warm start"
+	for p in all_projects():
+		if p['id'] == project_id:
+			return reset_project(p)
+
+	ctx.call('killServer', project_id)
+
 class SublimeLoaderDelegate(pyv8loader.LoaderDelegate):
 	def __init__(self, settings=None):
 		if settings is None:
@@ -190,7 +365,7 @@ def ternjs_file_reader(f, proj=None):
 					break
 
 	try:
-		return _js_file_reader(file_path, True)
+		return file_cache.get(file_path)
 	except Exception as e:
 		print(e)
 		return None
@@ -202,6 +377,17 @@ def file_name_from_view(view):
 
 	return name
 
+def project_file_name(view, proj=None):
+	"""
+	Returns file name of given view as known by server of given
+	project: files inside project folder are named relative to it
+	"""
+	name = file_name_from_view(view)
+	if proj and proj.get('id', 'empty') != 'empty' and proj.get('dir') and os.path.isabs(name):
+		return project.resolve_project_file_path(name, proj['dir'])
+
+	return name
+
 def view_for_buffer_id(buf_id):
 	for w in sublime.windows():
 		for v in w.views():
@@ -211,7 +397,109 @@ def view_for_buffer_id(buf_id):
 	return None
 
 def view_contents(view):
-	return view.substr(sublime.Region(0, view.size()))
+	"Returns text of given view, cached until view is changed"
+	change_count = view.change_count()
+	entry = view_texts.get(view.buffer_id())
+	if entry and entry[0] == change_count:
+		return entry[1]
+
+	text = view.substr(sublime.Region(0, view.size()))
+	view_texts.put(view.buffer_id(), (change_count, text))
+	return text
+
+def view_state(view, proj=None):
+	"""
+	Returns state of given view required to build TernJS request.
+	Text of dirty view is omitted if server of given project
+	already has it
+	"""
+	project_id = (proj or {}).get('id', 'empty')
+	sel = view.sel()[0]
+	state = {
+		'file': project_file_name(view, proj),
+		'start': sel.begin(),
+		'end': sel.end(),
+		'dirty': view.is_dirty()
+	}
+
+	if state['dirty']:
+		state['version'] = view.change_count()
+		if synced_versions.get((project_id, state['file'])) != state['version']:
+			state['text'] = view_contents(view)
+
+	return state
+
+def ternjs_query(view, proj, query, **options):
+	"""
+	Runs TernJS query for given view. All query data is passed
+	to JS as a single JSON string and result is returned the same way.
+	Additional `options` are passed to JS query handler as is
+	"""
+	if warm_up:
+		warm_up.touch()
+
+	crossings = ctx.crossings
+	project_id = proj.get('id', 'empty')
+	data = {
+		'project': project_id,
+		'query': query,
+		'view': view_state(view, proj),
+		'deadline': deadline.query_deadline(settings.get('query_deadlines'), query['type'])
+	}
+	data.update(options)
+
+	res = None
+	started = time.time()
+	with deadline.OverrunGuard(ctx, settings.get('query_kill_timeout', 0) / 1000.0) as guard:
+		res = ctx.call('ternQuery', json.dumps(data, ensure_ascii=False), guard=guard)
+		if res and res.startswith('{"needText"') and not guard.fired:
+			# server doesn't have omitted text, e.g. it was restarted
+			data['view']['text'] = view_contents(view)
+			res = ctx.call('ternQuery', json.dumps(data, ensure_ascii=False), guard=guard)
+
+	elapsed = (time.time() - started) * 1000
+	if settings.get('debug', False):
+		print('TernJS: %s query made %d bridge crossings' % (query['type'], ctx.crossings - crossings))
+
+	if guard.fired:
+		print('TernJS: %s query terminated after %d ms' % (query['type'], elapsed))
+		handle_overrun(proj)
+		return None
+
+	res = json.loads(res) if res else None
+	if res and res.pop('synced', False):
+		synced_versions.put((project_id, data['view']['file']), data['view']['version'])
+
+	timing = res and res.pop('timing', None)
+	if timing:
+		phase_stats.add(query['type'], timing)
+		if settings.get('debug', False):
+			print('TernJS: %s query %s' % (query['type'], stats.phase_line(timing)))
+
+	if res and res.get('skipped'):
+		print('TernJS: %s query hit %d ms deadline after %d ms, %d files are not analyzed yet' % (query['type'], data['deadline'], elapsed, res['skipped']))
+
+	return res
+
+def handle_overrun(proj):
+	"""
+	Handles terminated TernJS query: excludes file that caused it
+	from analysis and restarts server of given project,
+	which state is inconsistent now
+	"""
+	busy = ctx.busy_file()
+	if busy and busy[0] == proj.get('id', 'empty'):
+		# only files of terminated query's server could hang it
+		project_id, file_name = busy
+		excluded_files.setdefault(project_id, set()).add(file_name)
+		print('TernJS: excluding %s of %s from analysis' % (file_name, project_id))
+
+	def restart():
+		state_store.forget(proj.get('id', 'empty'))
+		ctx.call('killServer', proj.get('id', 'empty'))
+		sync_project(proj or {'id': 'empty'})
+
+	sublime.set_timeout(restart, 0)
 
 def js_file_reader(file_path, use_unicode=True):
 	if hasattr(sublime, 'load_resource'):
@@ -239,90 +527,6 @@ def can_run():
 def active_view():
 	return sublime.active_window().active_view()
 
-def completion_hint(t):
-	suffix = ''
-	if t == '?':
-		suffix = 'unknown'
-	elif t == "number" or t == "string" or t == "bool":
-		suffix = t
-	elif re.match(r'fn\(', t):
-		suffix = 'fn'
-	elif re.match(r'\[', t):
-		suffix = 'array'
-	else:
-		suffix = 'object'
-
-	return icons.get(suffix, suffix)
-
-def sanitize_func_def(fn):
-	"""
-	Parses function definition from given completion.
-	The function might be quite complex, something like this:
-	fn(arg1 : str, arg2 : fn(arg3 : str, arg4 : str))
-	"""
-	m = re.match(r'fn\(', fn)
-	if not m: return None
-
-	args_str = re.sub(r'->\s*[^\)]*$', '', fn).strip()
-	args_str = args_str[3:-1]
-	sanitized_args = ''
-	i = 0
-	ln = len(args_str)
-	braces_stack = 0
-
-	while i < ln:
-		ch = args_str[i]
-		if ch == '(':
-			braces_stack += 1
-			j = i + 1
-			while j < ln:
-				ch2 = args_str[j]
-				if   ch2 == '(': braces_stack += 1
-				elif ch2 == ')': braces_stack -= 1
-				if braces_stack == 0: break
-				j += 1
-
-			i = j
-		else:
-			sanitized_args += ch
-		
-		i += 1
-
-	return sanitized_args
-
-
-
-def completion_item(item):
-	"Returns ST completion representation for given Tern one"
-	t = item['type']
-	label = item['text']
-	value = item['text'].replace('$', '\\$')
-	fn_def = sanitize_func_def(t)
-	if fn_def is not None:
-		args = [p.split(':')[0].strip() for p in fn_def.split(',')]
-		label += '(%s)' % ', '.join(args)
-
-		# split args into mandatory and optional lists
-		opt_pos = len(args)
-		for i, a in enumerate(args):
-			if a and a[-1] == '?':
-				opt_pos = i
-				break
-
-		mn_args = args[0:opt_pos]
-		opt_args = args[opt_pos:]
-		value += '(' + ', '.join(['${%d:%s}' % (i + 1, v) for i, v in enumerate(mn_args)])
-		if opt_args:
-			offset = len(mn_args)
-			opt_args_str = ', '.join(['${%d:%s}' % (offset + i + 2, v[:-1]) for i, v in enumerate(opt_args)])
-			value += '${%d:, %s}' % (offset + 1, opt_args_str)
-
-		value += ')'
-	else:
-		label += '\t%s' % completion_hint(t)
-
-	return (label, value)
-
 def all_projects():
 	proj = copy(project.all_projects())
 	proj.append({'id': 'empty'})
@@ -331,9 +535,8 @@ def all_projects():
 def sync_project(p, check_exists=False):
 	if not can_run(): return
 
-	with ctx.js() as c:
-		if check_exists and c.locals.hasServer(p['id']):
-			return
+	if check_exists and ctx.call('hasServer', p['id']):
+		return
 
 	print('Syncing project %s' % p['id'])
 
@@ -344,6 +547,18 @@ def sync_project(p, check_exists=False):
 		if l not in libs:
 			libs.append(l)
 
+	if settings.get('vendor_detection', True) and 'files' in p:
+		# load defs of known libraries instead of analyzing their copies
+		vendored = vendor_detector.detect(p)
+		for f in sorted(vendored):
+			print('TernJS: %s is a copy of %s, using its defs' % (f, vendored[f]))
+			if vendored[f] not in libs:
+				libs.append(vendored[f])
+
+		if vendored:
+			p = copy(p)
+			p['files'] = [f for f in p['files'] if f not in vendored]
+
 	# resolve all libraries
 	resolved_libs = []
 	project_dir = os.path.dirname(p['id'])
@@ -359,21 +574,153 @@ def sync_project(p, check_exists=False):
 			if os.path.isfile(lib_path):
 				resolved_libs.append(_js_file_reader(lib_path))
 
+	missing = []
+	if settings.get('node_modules_defs', True) and 'node' in (config.get('plugins') or {}):
+		# dependencies are loaded as precomputed defs,
+		# only project code is analyzed
+		# missing defs are generated after server is started
+		cached, missing = dependency_defs.defs(p)
+		resolved_libs += cached
+		if 'files' in p:
+			p = copy(p)
+			p['files'] = [f for f in p['files'] if 'node_modules' not in f.replace('\\', '/').split('/')]
+
+	excluded = excluded_files.get(p['id'])
+	if excluded and 'files' in p:
+		p = copy(p)
+		p['files'] = [f for f in p['files'] if f not in excluded]
+
+	if settings.get('warm_start', True) and 'files' in p:
+		# use condensed state of previous session instead
+		# of analyzing unchanged files
+		defs, warm_files = state_store.warm_start(p)
+		if defs:
+			resolved_libs.append(defs)
+			p = copy(p)
+			p['files'] = [f for f in p['files'] if f not in warm_files]
+
+	# read project files ahead while TernJS is busy with
+	# the ones that are already read
+	prefetch_project_files(p)
+
 	# pass data as JSON string to ensure that all
 	# data types are valid
-	with ctx.js() as c:
-		c.locals.startServer(json.dumps(p, ensure_ascii=False), resolved_libs)
+	options = {
+		'parseCacheSize': settings.get('parse_cache_size', 16) * 1024 * 1024
+	}
+
+	ctx.call('startServer', json.dumps(p, ensure_ascii=False), resolved_libs, json.dumps(options))
+
+	server_watchdog.touch(p['id'])
+	server_watchdog.check(keep=p['id'])
+	schedule_warm_up(p['id'])
+	if missing:
+		schedule_dependency_defs(p['id'], missing)
+
+def schedule_dependency_defs(project_id, packages):
+	"Queues generation of defs of given npm packages of project"
+	if not dependency_queue.schedule(project_id, packages):
+		return
+
+	if is_st3():
+		t = threading.Thread(target=run_dependency_defs)
+		t.daemon = True
+		t.start()
+	else:
+		# ST2 API is not thread-safe, packages are processed from editor timer
+		sublime.set_timeout(run_dependency_defs, 100)
+
+def run_dependency_defs():
+	if is_st3():
+		while dependency_queue.step():
+			pass
+	elif dependency_queue.step():
+		sublime.set_timeout(run_dependency_defs, 50)
+
+def add_dependency_defs(project_id, defs):
+	"Adds generated defs of npm dependencies to running server of given project"
+	if can_run() and ctx.call('addServerDefs', project_id, defs):
+		print('TernJS: defs of %d dependencies are added to %s' % (len(defs), project_id))
+		schedule_warm_up(project_id)
+
+def condense_package(pkg):
+	"Generates defs of given npm package"
+	libs = [ctx.default_libs[l] for l in ['ecma5'] if l in ctx.default_libs]
+	return ctx.call('condensePackage', json.dumps(pkg, ensure_ascii=False), libs)
+
+def ensure_server(proj):
+	"""
+	Prepares server of given project for upcoming request:
+	restarts it if it was stopped by memory watchdog
+	"""
+	project_id = proj.get('id', 'empty')
+	if server_watchdog.is_evicted(project_id):
+		sync_project(proj or {'id': 'empty'})
+
+	server_watchdog.touch(project_id)
+	server_watchdog.check(keep=project_id)
 
 class ProjectSyncThread(threading.Thread):
-	def __init__(self, projects):
+	def __init__(self, projects, check_exists=False):
 		self.projects = projects
+		self.check_exists = check_exists
 		threading.Thread.__init__(self)
+		self.daemon = True
 
 	def run(self):
-		print('Start syncing')
 		for p in self.projects:
-			sync_project(p)
+			try:
+				sync_project(p, self.check_exists)
+			except Exception as e:
+				print('TernJS: unable to sync %s: %s' % (p['id'], e))
+
+def queue_sync(view):
+	"""
+	Queues sync of project of given loaded view. Loads are collected
+	for a short time so restoring session or opening a folder results
+	in a single sync per project
+	"""
+	_loaded_views.append(view)
+	if len(_loaded_views) == 1:
+		sublime.set_timeout(flush_syncs, settings.get('sync_batch_delay', 100))
+
+def flush_syncs():
+	"Syncs projects of queued views"
+	views = _loaded_views[:]
+	del _loaded_views[:]
+
+	projects = []
+	for view in views:
+		p = track_view(view)
+		if p and p not in projects:
+			projects.append(p)
+
+	if not projects or not can_run():
+		return
+
+	if is_st3():
+		# ST3 API is thread-safe, don't block editor while
+		# servers are started
+		ProjectSyncThread(projects, True).start()
+	else:
+		for p in projects:
+			sync_project(p, True)
+
+
+def prefetch_project_files(p):
+	"Starts reading files of given project into file cache"
+	if settings.get('engine') == 'node':
+		# worker reads project files itself
+		return
 
+	proj_dir = p.get('dir')
+	paths = []
+	for f in p.get('files', []):
+		if not os.path.isabs(f) and proj_dir:
+			f = os.path.join(proj_dir, f)
+		paths.append(f)
+
+	file_cache.prefetch(paths)
 
 def sync_all_projects():
 	if not can_run(): return
@@ -381,22 +728,134 @@ def sync_all_projects():
 	# thread = ProjectSyncThread(all_projects())
 	# thread.start()
 
-	for p in all_projects():
+	projects = all_projects()
+	for p in projects:
+		prefetch_project_files(p)
+
+	for p in projects:
 		sync_project(p)
 
-def reset_project(p):
+def save_project_state(p):
+	"Saves condensed state of given project for warm start"
+	if not can_run() or not settings.get('warm_start', True) or 'files' not in p:
+		return
+
+	try:
+		data = ctx.call('condenseServer', p['id'], state_store.defs_name(p['id']))
+		if data:
+			state_store.save(p, json.loads(data))
+	except Exception as e:
+		print('TernJS: unable to save state of %s: %s' % (p['id'], e))
+
+def reset_project(p, keep_state=True):
+	"""
+	Stops server of given project. With `keep_state`, inferred types
+	are saved for warm start, otherwise saved state is removed
+	"""
 	if not can_run(): return
-	with ctx.js() as c:
-		c.locals.killServer(p['id'])
+	if keep_state:
+		save_project_state(p)
+		state_store.forget(p['id'])
+	else:
+		state_store.discard(p['id'])
+	ctx.call('killServer', p['id'])
+	server_watchdog.forget(p['id'])
+	if warm_up:
+		warm_up.cancel(p['id'])
+
+	# new server has no texts of unsaved views
+	for key in synced_versions.keys():
+		if key[0] == p['id']:
+			synced_versions.pop(key)
+
+def track_view(view):
+	"Registers given JS view as a user of its project, returns this project"
+	if not is_js_view(view) or project_lifecycle.is_orphan(view.id()):
+		return None
+
+	if project_lifecycle.has_view(view.id()):
+		return project.project_for_view(view)
+
+	project_id = project.project_id_for_view(view)
+	if project_id:
+		# project might be released when its last window was closed
+		project.add_to_cache(project_id)
+
+	p = project.project_for_view(view)
+	if p:
+		project_lifecycle.attach(p['id'], view.id())
+	else:
+		# don't look up project on every activation
+		project_lifecycle.mark_orphan(view.id())
+	return p
+
+def untrack_view(view):
+	"Schedules release of projects that are not used by any view anymore"
+	if not project_lifecycle: return
+	_loaded_views[:] = [v for v in _loaded_views if v.id() != view.id()]
+	for project_id in project_lifecycle.detach(view.id()):
+		print('TernJS: no views of %s left, releasing its server in %d seconds' % (project_id, project_lifecycle.grace))
+		schedule_release()
+
+def schedule_release():
+	sublime.set_timeout(release_projects, int(project_lifecycle.grace * 1000) + 100)
+
+def release_projects():
+	"Stops servers of projects which grace period is over"
+	opened = project.projects_from_opened_files()
+	for project_id in project_lifecycle.expired():
+		if project_id in opened:
+			# window of project is still open, check it later
+			project_lifecycle.postpone(project_id)
+			schedule_release()
+			continue
+
+		print('TernJS: releasing server of %s' % project_id)
+		for p in project.all_projects():
+			if p['id'] == project_id:
+				reset_project(p)
+		project.remove_from_cache(project_id)
+		excluded_files.pop(project_id, None)
 
 def reset_all_projects():
 	if not can_run(): return
 	for p in all_projects():
 		reset_project(p)
 
+def reload_project(project_id):
+	"""
+	Applies changes of saved project file: restarts server of this
+	project only if its libraries or plugins were changed, or
+	updates list of its files
+	"""
+	if not can_run(): return
+
+	old, new = project.reload_info(project_id)
+	if old is None:
+		if project_id in project.projects_from_opened_files():
+			# project wasn't used yet, its views might be
+			# considered as ones without project
+			project_lifecycle.orphans.clear()
+			project.add_to_cache(project_id)
+			sync_project(new, True)
+		return
+
+	changes = project.config_changes(old.get('config', {}), new['config'])
+	if [k for k in changes if k in project.SERVER_KEYS]:
+		print('TernJS: %s of %s changed, restarting its server' % (', '.join(changes), project_id))
+		# saved types depend on libraries and plugins
+		reset_project(old, keep_state=False)
+		sync_project(new)
+	elif [k for k in changes if k in project.FILE_KEYS]:
+		print('TernJS: %s of %s changed, updating its files' % (', '.join(changes), project_id))
+		sync_project(new)
+
 def reload_ternjs():
+	if can_run():
+		ctx.call('resetPlugins')
 	reset_all_projects()
 	project.reset_cache()
+	project_lifecycle.clear()
 	sync_all_projects()
 
 def apply_jump_def(view, dfn=None):
@@ -435,22 +894,34 @@ class TernJSEventListener(sublime_plugin.EventListener):
 	def on_load(self, view):
 		if is_js_view(view):
 			apply_jump_def(view)
-			p = project.project_for_view(view)
-			if p:
-				sync_project(p, True)
+			queue_sync(view)
+
+	def on_activated(self, view):
+		if can_run() and is_js_view(view) and not project_lifecycle.has_view(view.id()):
+			# view might be opened before plugin was loaded
+			queue_sync(view)
+
+	def on_close(self, view):
+		untrack_view(view)
 
 	def on_post_save(self, view):
 		file_name = view.file_name()
 		if file_name and file_name.endswith('.sublime-project'):
-			# Project file was updated, re-scan all projects
-			return reload_ternjs()
+			# Project file was updated, apply its changes
+			return reload_project(file_name)
 
 		if is_js_view(view):
 			p = project.project_for_view(view)
 			if p:
 				def _callback():
-					with ctx.js() as c:
-						c.locals.forceFileUpdate(view, p['id'])
+					state = view_state(view, p)
+					state['text'] = view_contents(view)
+					res = ctx.call('ternUpdateFile', json.dumps({'project': p['id'], 'view': state}, ensure_ascii=False))
+					res = json.loads(res) if res else None
+					if res and res.get('timing'):
+						phase_stats.add('update', res['timing'])
+					if res and res['reanalyzed'] and settings.get('debug', False):
+						print('TernJS: %s changed, %d dependent files re-analyzed' % (state['file'], res['reanalyzed']))
 
 				sublime.set_timeout(_callback, 1)
 			return
@@ -461,13 +932,16 @@ class TernJSEventListener(sublime_plugin.EventListener):
 			return None
 
 		proj = project.project_for_view(view) or {}
-		with ctx.js() as c:
-			completions = c.locals.ternHints(view, proj.get('id', 'empty'))
-			if completions and hasattr(completions, 'list'):
-				cmpl = [completion_item(_c) for _c in completions['list']]
-				# print(cmpl)
-				return cmpl
-
+		ensure_server(proj)
+		completions = ternjs_query(view, proj, {'type': 'completions', 'types': True},
+			completions={
+				'limit': settings.get('completions_limit', 200),
+				'fuzzy': settings.get('completions_fuzzy', False)
+			})
+		if completions and 'list' in completions:
+			cmpl = [completion_item(_c) for _c in completions['list']]
+			# print(cmpl)
+			return cmpl
 
 		return None
 
@@ -491,26 +965,29 @@ class TernjsJumpToDefinition(sublime_plugin.TextCommand):
 		view = active_view()
 
 		proj = project.project_for_view(view) or {}
-		with ctx.js() as c:
-			dfn = c.locals.ternJumpToDefinition(view, proj.get('id', 'empty'))
-			if dfn:
-				target_file = dfn['file']
-
-				# resolve target file
-				if not os.path.isabs(target_file) and proj.get('id', 'empty')  != 'empty':
-					target_file = os.path.join(proj['dir'], target_file)
-					dfn['file'] = target_file
-
-				if target_file != file_name_from_view(view):
-					target_view = view.window().open_file(target_file)
-
-					if not target_view.is_loading():
-						apply_jump_def(target_view, dfn)
-					else:
-						globals()['_jump_def'] = dfn
-						return
-				else:
-					apply_jump_def(view, dfn)
+		ensure_server(proj)
+		dfn = ternjs_query(view, proj, {'type': 'definition'})
+		if dfn and 'file' in dfn:
+			jump_to(view, proj, dfn)
+
+def jump_to(view, proj, dfn):
+	"Opens file with given definition and selects it"
+	target_file = dfn['file']
+
+	# resolve target file
+	if not os.path.isabs(target_file) and proj.get('id', 'empty')  != 'empty':
+		target_file = os.path.join(proj['dir'], target_file)
+		dfn['file'] = target_file
+
+	if target_file != file_name_from_view(view):
+		target_view = view.window().open_file(target_file)
+
+		if not target_view.is_loading():
+			apply_jump_def(target_view, dfn)
+		else:
+			globals()['_jump_def'] = dfn
+	else:
+		apply_jump_def(view, dfn)
 
 class TernjsRenameVariable(sublime_plugin.TextCommand):
 	def run(self, edit, **kw):
@@ -518,35 +995,37 @@ class TernjsRenameVariable(sublime_plugin.TextCommand):
 		view = active_view()
 
 		proj = project.project_for_view(view) or {}
-		with ctx.js() as c:
-			refs = c.locals.ternFindRefs(view, proj.get('id', 'empty'))
-			
-			# do rename for local references only
-			regions = []
-			file_name = file_name_from_view(view)
-			caret_pos = view.sel()[0].begin()
-			ctx_region = None
-
-			for r in refs['refs']:
-				if file_name == r['file']:
-					rg = sublime.Region(r['start'], r['end'])
-					if rg.contains(caret_pos):
-						ctx_region = len(regions)
-					regions.append(rg)
-
-			if regions:
-				sel = view.sel()
-				sel.clear()
-				for r in regions:
-					sel.add(r)
-				view.add_regions(rename_region_key, regions, 'string', flags=sublime.HIDDEN)
-
-				# create rename session
-				globals()['_rename_session'] = {
-					'old_name': view.substr(view.sel()[0]),
-					'ctx_region': ctx_region,
-					'caret_pos': caret_pos
-				}
+		ensure_server(proj)
+		refs = ternjs_query(view, proj, {'type': 'refs'})
+		if not refs:
+			return
+
+		# do rename for local references only
+		regions = []
+		file_name = project_file_name(view, proj)
+		caret_pos = view.sel()[0].begin()
+		ctx_region = None
+
+		for r in refs['refs']:
+			if file_name == r['file']:
+				rg = sublime.Region(r['start'], r['end'])
+				if rg.contains(caret_pos):
+					ctx_region = len(regions)
+				regions.append(rg)
+
+		if regions:
+			sel = view.sel()
+			sel.clear()
+			for r in regions:
+				sel.add(r)
+			view.add_regions(rename_region_key, regions, 'string', flags=sublime.HIDDEN)
+
+			# create rename session
+			globals()['_rename_session'] = {
+				'old_name': view.substr(view.sel()[0]),
+				'ctx_region': ctx_region,
+				'caret_pos': caret_pos
+			}
 
 class TernjsCommitRename(sublime_plugin.TextCommand):
 	def run(self, edit, **kw):
@@ -568,18 +1047,20 @@ class FindOccurance(sublime_plugin.TextCommand):
 		view = active_view()
 
 		proj = project.project_for_view(view) or {}
-		with ctx.js() as c:
-			refs = c.locals.ternFindRefs(view, proj.get('id', 'empty'))
+		ensure_server(proj)
+		refs = ternjs_query(view, proj, {'type': 'refs'})
+		if not refs:
+			return []
 
-			# use local references only
-			regions = []
-			file_name = file_name_from_view(view)
+		# use local references only
+		regions = []
+		file_name = project_file_name(view, proj)
 
-			for r in refs['refs']:
-				if file_name == r['file']:
-					regions.append(sublime.Region(r['start'], r['end']))
+		for r in refs['refs']:
+			if file_name == r['file']:
+				regions.append(sublime.Region(r['start'], r['end']))
 
-			return regions
+		return regions
 
 class TernjsNextOccurance(FindOccurance):
 	def run(self, edit, **kw):
@@ -605,8 +1086,105 @@ class TernjsPreviousOccurance(FindOccurance):
 				view.show(r)
 				return
 
+class TernjsGoToSymbol(sublime_plugin.WindowCommand):
+	def run(self):
+		if not can_run(): return
+		view = self.window.active_view()
+		if not view: return
+
+		prefix = ''
+		sel = view.sel()
+		if len(sel):
+			prefix = view.substr(view.word(sel[0])).strip()
+			if not re.match(r'^[\w$]+$', prefix):
+				prefix = ''
+
+		self.window.show_input_panel('Symbol:', prefix, lambda text: self.show_symbols(view, text), None, None)
+
+	def show_symbols(self, view, prefix):
+		proj = project.project_for_view(view) or {}
+		data = ctx.call('ternSymbols', proj.get('id', 'empty'), prefix.strip(), settings.get('symbols_limit', 500))
+		symbols = json.loads(data) if data else []
+		if not symbols:
+			sublime.status_message('No symbols start with "%s"' % prefix)
+			return
+
+		def on_select(ix):
+			if ix != -1:
+				jump_to(view, proj, symbols[ix])
+
+		items = [[s['name'], '%s: %s' % (s['kind'], s['type']), s['file']] for s in symbols]
+		self.window.show_quick_panel(items, on_select)
+
+def show_panel(window, name, text):
+	"Displays given text in output panel"
+	panel = window.get_output_panel(name)
+	if is_st3():
+		panel.run_command('append', {'characters': text})
+	else:
+		edit = panel.begin_edit()
+		panel.insert(edit, 0, text)
+		panel.end_edit(edit)
+	window.run_command('show_panel', {'panel': 'output.%s' % name})
+
+class TernjsShowStatistics(sublime_plugin.WindowCommand):
+	def run(self):
+		if not can_run(): return
+
+		caches = []
+		analysis = []
+		data = ctx.call('queryStats')
+		if data:
+			info = json.loads(data)
+			results = info['results']
+			caches.append(stats.cache_line('Query results', results['hits'], results['misses'], results['size']))
+			parse = info['parse']
+			caches.append(stats.cache_line('Syntax trees', parse['hits'], parse['misses'], parse['size']))
+			analysis.append('%d file changes, %d dependent files re-analyzed' % (info['reanalysis']['changes'], info['reanalysis']['files']))
+
+		caches.append(stats.lru_line('Completion items', completion.cache))
+		caches.append(stats.lru_line('Project files', file_cache.cache))
+
+		show_panel(self.window, 'ternjs_stats', stats.report([
+			('Caches', caches),
+			('Incremental analysis', analysis),
+			('Request phases, ms', phase_stats.lines())
+		]))
+
+class TernjsMemoryReport(sublime_plugin.WindowCommand):
+	def run(self):
+		if not can_run(): return
+
+		info = json.loads(ctx.call('memoryInfo'))
+		parse = info['parse']
+		servers = memory.server_lines(info['servers'])
+		servers.append('Syntax trees: %d cached, %s of sources' % (parse['size'], memory.format_size(parse['bytes'])))
+
+		python = memory.python_lines([
+			('Project list', project.all_projects()),
+			('Default libs', ctx.default_libs),
+			('Excluded files', excluded_files)
+		], settings.get('memory_report_top', 10))
+		python.insert(0, 'File cache           %d files, %s' % (len(file_cache.cache), memory.format_size(file_cache.cache.size)))
+
+		show_panel(self.window, 'ternjs_memory', stats.report([
+			('Engine heap', memory.heap_lines(ctx.heap_statistics())),
+			('Project servers', servers),
+			('Python', python)
+		]))
+
 def plugin_loaded():
 	init()
 
+def plugin_unloaded():
+	globals()['memory_sampler'] = None
+	if warm_up:
+		warm_up.stop()
+	for p in all_projects():
+		save_project_state(p)
+	if ctx:
+		# stops Node.js worker as well
+		ctx.reset()
+
 if not is_st3():
 	sublime.set_timeout(init, 200)
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+Converts TernJS completions into Sublime Text completion items
+"""
+from lru import LRUCache
+
+icons = {
+	'object':  '{}',
+	'array':   '[]',
+	'number':  '(num)',
+	'string':  '(str)',
+	'bool':    '(bool)',
+	'fn':      'fn()',
+	'unknown': '(?)'
+}
+
+# Converted completions: the same name and type pairs
+# come back thousands of times per session
+cache = LRUCache(5000)
+
+def completion_hint(t):
+	suffix = ''
+	if t == '?':
+		suffix = 'unknown'
+	elif t == "number" or t == "string" or t == "bool":
+		suffix = t
+	elif t.startswith('fn('):
+		suffix = 'fn'
+	elif t.startswith('['):
+		suffix = 'array'
+	else:
+		suffix = 'object'
+
+	return icons.get(suffix, suffix)
+
+def func_args(fn):
+	"""
+	Parses function definition from given completion and returns list
+	of its top-level arguments, with types of arguments removed.
+	The function might be quite complex, something like this:
+	fn(arg1 : str, arg2 : fn(arg3 : str, arg4 : str)) -> str
+	Returns `None` if given type is not a function
+	"""
+	if not fn.startswith('fn('):
+		return None
+
+	# strip trailing return type, unless it contains braces
+	end = fn.find('->', fn.rfind(')') + 1)
+	if end != -1:
+		fn = fn[:end]
+
+	args_str = fn.strip()[3:-1]
+	args = []
+	arg = []
+	depth = 0
+
+	for ch in args_str:
+		if depth:
+			if ch == '(':
+				depth += 1
+			elif ch == ')':
+				depth -= 1
+		elif ch == '(':
+			depth = 1
+		elif ch == ',':
+			args.append(''.join(arg))
+			arg = []
+		else:
+			arg.append(ch)
+
+	args.append(''.join(arg))
+	return [a.split(':')[0].strip() for a in args]
+
+def convert(text, t):
+	"Returns ST completion `(label, snippet)` for given name and type"
+	label = text
+	value = text.replace('$', '\\$')
+	args = func_args(t)
+	if args is not None:
+		label += '(%s)' % ', '.join(args)
+
+		# split args into mandatory and optional lists
+		opt_pos = len(args)
+		for i, a in enumerate(args):
+			if a and a[-1] == '?':
+				opt_pos = i
+				break
+
+		mn_args = args[0:opt_pos]
+		opt_args = args[opt_pos:]
+		value += '(' + ', '.join(['${%d:%s}' % (i + 1, v) for i, v in enumerate(mn_args)])
+		if opt_args:
+			offset = len(mn_args)
+			opt_args_str = ', '.join(['${%d:%s}' % (offset + i + 2, v[:-1]) for i, v in enumerate(opt_args)])
+			value += '${%d:, %s}' % (offset + 1, opt_args_str)
+
+		value += ')'
+	else:
+		label += '\t%s' % completion_hint(t)
+
+	return (label, value)
+
+def completion_item(item):
+	"Returns ST completion representation for given Tern one"
+	key = (item['text'], item['type'])
+	result = cache.get(key)
+	if result is None:
+		result = convert(key[0], key[1])
+		cache.put(key, result)
+
+	return result
@@ -7,6 +7,7 @@ import json
 import gc
 import imp
 import re
+import threading
 import tern_plugin
 
 is_python3 = sys.version_info[0] > 2
@@ -18,10 +19,13 @@ TERNJS_LIBS = ['ecma5.json', 'browser.json', 'jquery.json', 'underscore.json']
 # Default libraries that should be loaded for every project
 DEFAULT_LIBS = ['ecma5']
 
+HEAP_STATISTICS_KEYS = ['total_heap_size', 'used_heap_size', 'heap_size_limit']
+
 TERNJS_FILES = ['js/bootstrap.js',
 			  'js/acorn.js', 'js/acorn_loose.js', 'js/walk.js',
 			  'lib/signal.js', 'lib/tern.js', 'lib/comment.js','lib/def.js', 'lib/jsdoc.js', 'lib/infer.js',
-			  'js/lodash.js', 'js/controller.js']
+			  'lib/condense.js',
+			  'js/lodash.js', 'js/parsecache.js', 'js/symbols.js', 'js/controller.js']
 
 try:
 	isinstance("", basestring)
@@ -120,6 +124,13 @@ class Context():
 
 		self._ctx = None
 		self._contrib = contrib
+		self.plugin_cache = tern_plugin.PluginCache()
+
+		# number of Python/JS bridge crossings
+		self.crossings = 0
+
+		# recorder of bridge calls, see `tracing.py`
+		self.tracer = None
 
 		# detect reader encoding
 		self._use_unicode = None
@@ -161,8 +172,12 @@ class Context():
 			if self._use_unicode is None:
 				self._use_unicode = should_use_unicode()
 
+			# projects might be synced in background thread
+			thread_lock = threading.RLock()
+
 			class JSContext(PyV8.JSContext):
 				def __enter__(self):
+					thread_lock.acquire()
 					if not hasattr(self, '_counter'):
 						self._counter = 0
 					if not self._counter:
@@ -184,6 +199,7 @@ class Context():
 						if self.lock:
 							self.lock.leave()
 							self.lock = None
+					thread_lock.release()
 
 			self._ctx = JSContext()
 
@@ -194,17 +210,100 @@ class Context():
 			with self._ctx as ctx:
 				self._ctx.locals.log = js_log
 				self._ctx.locals.loadPlugin = self.load_plugin
+				self._ctx.locals.forgetFailedPlugins = lambda: self.plugin_cache.forget_failed()
 
 				if self._contrib:
 					for k in self._contrib:
-						self._ctx.locals[k] = self._contrib[k]
+						self._ctx.locals[k] = self._count_crossings(self._contrib[k])
 
 		return self._ctx
 
+	def heap_statistics(self):
+		"""
+		Returns V8 heap statistics as dict with `total_heap_size`,
+		`used_heap_size` and `heap_size_limit` keys, or `None` if
+		PyV8 binary doesn't expose them
+		"""
+		engine = getattr(globals().get('PyV8'), 'JSEngine', None)
+		get_stats = getattr(engine, 'getHeapStatistics', None)
+		if not get_stats:
+			return None
+
+		try:
+			stats = get_stats()
+		except Exception:
+			return None
+
+		result = {}
+		for k in HEAP_STATISTICS_KEYS:
+			v = stats.get(k) if isinstance(stats, dict) else getattr(stats, k, None)
+			if v is not None:
+				result[k] = v
+
+		return result or None
+
+	def collect(self):
+		"Runs engine garbage collector"
+		try:
+			PyV8.JSEngine.collect()
+		except:
+			pass
+
+	def _count_crossings(self, fn):
+		def wrapper(*args):
+			self.crossings += 1
+			return fn(*args)
+		return wrapper
+
+	def call(self, method, *args, **kw):
+		"""
+		Calls given JS function. For batched bridge calls, arguments and
+		result should be JSON strings: a call crosses bridge once in each
+		direction
+		@param guard: `OverrunGuard` that limits time of JS execution
+		"""
+		guard = kw.get('guard')
+		if self.tracer:
+			return self.tracer.call(method, args, lambda: self._call(method, args, guard))
+		return self._call(method, args, guard)
+
+	def _call(self, method, args, guard=None):
+		with self.js() as ctx:
+			self.crossings += 2
+			if not guard:
+				return getattr(ctx.locals, method)(*args)
+
+			# context is locked now, time limit of guard
+			# doesn't include waiting for other threads
+			guard.start()
+			try:
+				return getattr(ctx.locals, method)(*args)
+			finally:
+				guard.stop()
+
+	def terminate(self):
+		"Terminates JS code that is running in this context"
+		engine = getattr(globals().get('PyV8'), 'JSEngine', None)
+		if engine:
+			engine.terminateAllThreads()
+
+	def busy_file(self):
+		"""
+		Returns `(project id, file name)` that TernJS was parsing
+		or analyzing when its last request was terminated
+		"""
+		try:
+			data = self.call('getBusyFile')
+		except Exception:
+			return None
+
+		return tuple(json.loads(data)) if data else None
+
 	def reset(self):
 		"Resets JS execution context"
 		if self._ctx:
 			self._ctx = None
+			self.plugin_cache = tern_plugin.PluginCache()
 			try:
 				PyV8.JSEngine.collect()
 				gc.collect()
@@ -0,0 +1,69 @@
+"""
+Query deadlines.
+
+TernJS stops analyzing project files when query deadline passes and
+answers from what is already analyzed (see `analyzeAll()` in tern.js).
+Deadline is checked between files only, so a single pathological file
+can still hang the query: `OverrunGuard` terminates JS execution when
+query overruns its hard limit
+"""
+import threading
+
+def query_deadline(deadlines, query_type):
+	"Returns deadline, in ms, for given query type or `None`"
+	deadlines = deadlines or {}
+	return deadlines.get(query_type, deadlines.get('default'))
+
+class OverrunGuard():
+	"""
+	Context manager that terminates JS execution of given context
+	if guarded call doesn't finish in time. Call is guarded when guard
+	is passed to it, e.g. `ctx.call('ternQuery', data, guard=guard)`:
+	time limit counts only while the call is running, not while it
+	waits for context locked by other thread or for worker queue
+
+	@param ctx: JS context
+	@param timeout: Hard limit, in seconds. Guard is disabled if empty
+	"""
+	def __init__(self, ctx, timeout):
+		self.ctx = ctx
+		self.timeout = timeout
+		self.fired = False
+		self._timer = None
+		self._lock = threading.Lock()
+
+	def _terminate(self, timer):
+		with self._lock:
+			if self._timer is not timer:
+				# guarded call is already finished
+				return
+			self.fired = True
+			self.ctx.terminate()
+
+	def start(self):
+		"Starts time limit of guarded call, called when call starts running"
+		if not self.timeout:
+			return
+
+		with self._lock:
+			if not self._timer:
+				timer = threading.Timer(self.timeout, lambda: self._terminate(timer))
+				timer.daemon = True
+				self._timer = timer
+				timer.start()
+
+	def stop(self):
+		"Stops time limit, called when guarded call is finished"
+		with self._lock:
+			if self._timer:
+				self._timer.cancel()
+				self._timer = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.stop()
+
+		# exception of terminated JS call is expected
+		return self.fired
@@ -0,0 +1,217 @@
+"""
+Precomputed defs of npm dependencies for projects that use node plugin.
+
+Types of every package installed in project's `node_modules` are
+inferred once in a scratch TernJS server, condensed into defs and
+cached in a folder shared by all projects. Project servers load these
+defs as libraries instead of analyzing package sources. Missing defs
+are generated package by package with `GenerationQueue`, so servers
+start with cached defs without waiting for whole `node_modules` pass
+"""
+import os
+import os.path
+import json
+import codecs
+import hashlib
+import threading
+
+CACHE_VERSION = 1
+
+def read_json(file_path):
+	try:
+		with codecs.open(file_path, 'r', 'utf-8') as f:
+			return json.load(f)
+	except (IOError, OSError, ValueError):
+		return None
+
+def package_main(pkg_dir, meta):
+	"Returns main file of package, relative to package folder"
+	main = meta.get('main') or 'index.js'
+	main = os.path.normpath(main)
+	full_path = os.path.join(pkg_dir, main)
+	if os.path.isdir(full_path):
+		main = os.path.join(main, 'index.js')
+	elif not os.path.exists(full_path) and os.path.exists(full_path + '.js'):
+		main += '.js'
+
+	if not os.path.isfile(os.path.join(pkg_dir, main)):
+		return None
+
+	return main.replace('\\', '/')
+
+def package_hash(pkg_dir):
+	"""
+	Returns hash of package contents: paths, sizes and modification
+	times of package files, except nested dependencies
+	"""
+	h = hashlib.sha1()
+	for root, dirs, files in os.walk(pkg_dir):
+		dirs[:] = sorted(d for d in dirs if d != 'node_modules')
+		for f in sorted(files):
+			if f.endswith('.js') or f == 'package.json':
+				st = os.stat(os.path.join(root, f))
+				h.update(('%s:%d:%d\n' % (os.path.relpath(os.path.join(root, f), pkg_dir), st.st_size, st.st_mtime)).encode('utf-8'))
+
+	return h.hexdigest()
+
+class DependencyDefs():
+	"""
+	@param cache_dir: Folder where package defs are stored
+	@param generate: Function that receives package info and returns
+	its condensed defs as JSON string
+	"""
+	def __init__(self, cache_dir, generate, logger=None):
+		self.cache_dir = cache_dir
+		self.generate_defs = generate
+		self.logger = logger
+		# hashes of package folders, keyed by package.json mtime
+		self._hashes = {}
+
+	def log(self, message):
+		if self.logger:
+			self.logger(message)
+
+	def packages(self, project):
+		"Returns list of dependencies installed in given project"
+		project_dir = project.get('dir')
+		if not project_dir:
+			return []
+
+		meta = read_json(os.path.join(project_dir, 'package.json'))
+		if not meta:
+			return []
+
+		names = set()
+		for k in ['dependencies', 'devDependencies']:
+			names.update((meta.get(k) or {}).keys())
+
+		result = []
+		for name in sorted(names):
+			pkg_dir = os.path.join(project_dir, 'node_modules', name)
+			pkg_meta = read_json(os.path.join(pkg_dir, 'package.json'))
+			if not pkg_meta:
+				continue
+
+			main = package_main(pkg_dir, pkg_meta)
+			if main:
+				result.append({
+					'name': name,
+					'version': pkg_meta.get('version', ''),
+					'dir': pkg_dir.replace('\\', '/'),
+					'main': main
+				})
+
+		return result
+
+	def _hash(self, pkg):
+		pkg_dir = pkg['dir']
+		mtime = os.path.getmtime(os.path.join(pkg_dir, 'package.json'))
+		cached = self._hashes.get(pkg_dir)
+		if not cached or cached[0] != mtime:
+			cached = self._hashes[pkg_dir] = (mtime, package_hash(pkg_dir))
+		return cached[1]
+
+	def _cache_file(self, pkg):
+		key = '%s@%s-%s' % (pkg['name'], pkg['version'], self._hash(pkg))
+		return os.path.join(self.cache_dir, 'v%d' % CACHE_VERSION, key.replace('/', '+') + '.json')
+
+	def defs(self, project):
+		"""
+		Returns tuple of cached defs (as JSON strings) of dependencies
+		of given project and list of packages which defs are missing,
+		see `generate()`
+		"""
+		result = []
+		missing = []
+		for pkg in self.packages(project):
+			try:
+				cache_file = self._cache_file(pkg)
+			except OSError:
+				continue
+
+			if os.path.exists(cache_file):
+				with codecs.open(cache_file, 'r', 'utf-8') as f:
+					result.append(f.read())
+			else:
+				missing.append(pkg)
+
+		return result, missing
+
+	def generate(self, pkg):
+		"Generates and caches defs of given package, returns them as JSON string"
+		self.log('Generating defs for %s@%s' % (pkg['name'], pkg['version']))
+		try:
+			cache_file = self._cache_file(pkg)
+			defs = self.generate_defs(pkg)
+		except Exception as e:
+			self.log('Unable to generate defs for %s: %s' % (pkg['name'], e))
+			return None
+
+		if not defs:
+			return None
+
+		cache_dir = os.path.dirname(cache_file)
+		if not os.path.exists(cache_dir):
+			os.makedirs(cache_dir)
+
+		with codecs.open(cache_file, 'w', 'utf-8') as f:
+			f.write(defs)
+		return defs
+
+class GenerationQueue():
+	"""
+	Queue of packages which defs are generated one by one, so generation
+	can run in background thread or in editor timer slices
+
+	@param dependency_defs: `DependencyDefs` instance
+	@param on_ready: Function called with project id and list of defs
+	when all queued packages of project are processed
+	"""
+	def __init__(self, dependency_defs, on_ready):
+		self.dependency_defs = dependency_defs
+		self.on_ready = on_ready
+		self.queue = []
+		self.running = False
+		self._lock = threading.Lock()
+
+	def schedule(self, project_id, packages):
+		"""
+		Queues generation of defs of given project packages. Returns
+		`True` if queue is not processed yet and should be started
+		"""
+		with self._lock:
+			if not packages or project_id in [item[0] for item in self.queue]:
+				return False
+
+			self.queue.append((project_id, list(packages), []))
+			if self.running:
+				return False
+
+			self.running = True
+			return True
+
+	def step(self):
+		"Generates defs of next queued package, returns `True` if there's more work"
+		with self._lock:
+			if not self.queue:
+				self.running = False
+				return False
+			project_id, packages, ready = self.queue[0]
+			pkg = packages.pop(0)
+
+		defs = self.dependency_defs.generate(pkg)
+		if defs:
+			ready.append(defs)
+
+		with self._lock:
+			done = not packages
+			if done:
+				self.queue.pop(0)
+			more = bool(self.queue)
+			if not more:
+				self.running = False
+
+		if done and ready:
+			self.on_ready(project_id, ready)
+
+		return more
@@ -0,0 +1,102 @@
+"""
+Project-wide file content cache for TernJS `getFile` requests.
+
+TernJS reads project files one by one while it holds JS lock.
+With this cache, files are read ahead by a pool of threads so
+TernJS requests become memory look-ups
+"""
+import os
+import threading
+
+try:
+	import queue
+except ImportError:
+	import Queue as queue
+
+from lru import LRUCache
+from context import js_file_reader
+
+class FileCache():
+	"""
+	File contents cache bounded by total size of cached files.
+	Cached entries are validated by file mtime and size
+
+	@param max_size: Max total size of cached files, in bytes
+	@param workers: Number of threads used to prefetch files
+	@param reader: Function that reads file contents
+	"""
+	def __init__(self, max_size=64 * 1024 * 1024, workers=4, reader=js_file_reader):
+		self.cache = LRUCache(max_size, sizeof=lambda entry: len(entry[2]))
+		self.workers = workers
+		self.reader = reader
+		self._queue = None
+		self._pending = {}
+		self._lock = threading.Lock()
+
+	def _stat(self, file_path):
+		try:
+			st = os.stat(file_path)
+			return st.st_mtime, st.st_size
+		except OSError:
+			return None
+
+	def _read(self, file_path):
+		stat = self._stat(file_path)
+		if stat is None:
+			raise IOError('File %s does not exist' % file_path)
+
+		content = self.reader(file_path, True)
+		self.cache.put(file_path, (stat[0], stat[1], content))
+		return content
+
+	def get(self, file_path):
+		"Returns contents of given file"
+		with self._lock:
+			pending = self._pending.get(file_path)
+
+		if pending:
+			# file is being read by prefetch thread
+			pending.wait()
+
+		entry = self.cache.get(file_path)
+		if entry and self._stat(file_path) == entry[:2]:
+			return entry[2]
+
+		return self._read(file_path)
+
+	def prefetch(self, paths):
+		"Reads given files in background threads"
+		if not self.workers:
+			return
+
+		with self._lock:
+			if self._queue is None:
+				self._queue = queue.Queue()
+				for i in range(self.workers):
+					t = threading.Thread(target=self._worker)
+					t.daemon = True
+					t.start()
+
+			for p in paths:
+				if p not in self._pending and p not in self.cache:
+					self._pending[p] = threading.Event()
+					self._queue.put(p)
+
+	def _worker(self):
+		while True:
+			file_path = self._queue.get()
+			try:
+				self._read(file_path)
+			except Exception:
+				pass
+			finally:
+				with self._lock:
+					event = self._pending.pop(file_path, None)
+				if event:
+					event.set()
+
+	def invalidate(self, file_path):
+		self.cache.pop(file_path)
+
+	def clear(self):
+		self.cache.clear()
@@ -4,13 +4,104 @@
  * @type {Object}
  */
 var ternServers = {};
-var ternDocs = [];
 
-function startServer(project, libs) {
+/**
+ * Parsed definitions of loaded plugins, by plugin file
+ * @type {Object}
+ */
+var parsedPluginDefs = {};
+
+/**
+ * Unfiltered completions of last completions query for each project
+ * @type {Object}
+ */
+var completionsCache = {};
+
+/**
+ * Syntax trees of project files, reused by restarted servers
+ * @type {ParseCache}
+ */
+var parseCache = new ParseCache(0);
+
+/**
+ * Query results of each project. Results are valid while
+ * server generation is the same, see `sendRequest()`
+ * @type {Object}
+ */
+var resultCache = {};
+var resultCacheStats = {hits: 0, misses: 0};
+var RESULT_CACHE_SIZE = 100;
+
+/**
+ * Number of file changes and dependent files re-analyzed
+ * because of them
+ * @type {Object}
+ */
+var reanalysisStats = {changes: 0, files: 0};
+var reanalyzed = 0;
+
+/**
+ * Project id and name of file TernJS parses or analyzes now,
+ * used to find the file that caused terminated query
+ * @type {Array}
+ */
+var busyFile = null;
+
+function setBusyFile(projectId, fileName) {
+	if (!fileName && !busyFile) {
+		return;
+	}
+
+	busyFile = fileName ? [projectId, fileName] : null;
+	if (typeof reportBusyFile == 'function') {
+		// let host process know about it as well
+		reportBusyFile(projectId, fileName);
+	}
+}
+
+/**
+ * Returns JSON of `[projectId, fileName]` that TernJS was busy with
+ * @return {String}
+ */
+function getBusyFile() {
+	return busyFile ? JSON.stringify(busyFile) : null;
+}
+
+/**
+ * Returns parsed definitions of given plugin. Definitions are parsed
+ * once per plugin file and shared by all servers
+ * @param  {Object} plugin Plugin descriptor returned by `loadPlugin()`
+ * @return {Object}
+ */
+function pluginDefinitions(plugin) {
+	var key = String(plugin.path);
+	if (!(key in parsedPluginDefs)) {
+		var defs = plugin.definitions;
+		parsedPluginDefs[key] = _.isString(defs) ? JSON.parse(defs) : defs;
+	}
+
+	return parsedPluginDefs[key];
+}
+
+/**
+ * Drops parsed plugin definitions and lets plugins that failed
+ * to load be probed again, e.g. when user reloads TernJS
+ */
+function resetPlugins() {
+	parsedPluginDefs = {};
+	forgetFailedPlugins();
+}
+
+function startServer(project, libs, options) {
 	if (_.isString(project)) {
 		project = JSON.parse(project);
 	}
 
+	options = options ? JSON.parse(options) : {};
+	if ('parseCacheSize' in options) {
+		parseCache.maxSize = options.parseCacheSize;
+	}
+
 	libs = _.toArray(libs)
 	var files = project && project.files ? project.files : [];
 	
@@ -29,7 +120,7 @@ function startServer(project, libs) {
 				var plugin = loadPlugin(JSON.stringify(data), project);
 				if (plugin) {
 					if (plugin.definitions) {
-						defs.push(makeDef(plugin.definitions));
+						defs.push(pluginDefinitions(plugin));
 					}
 
 					pluginOptions['' + plugin.id] = plugin.config || {};
@@ -47,24 +138,112 @@ function startServer(project, libs) {
 			}, 
 			defs: defs,
 			plugins: pluginOptions,
+			parseFile: function(name, text, server) {
+				return parseCache.parse(name, text, server);
+			},
 			debug: false,
 			async: false,
 			projectDir: project.dir
 		});
+
+		ternServers[project.id].on('busy', function(fileName) {
+			setBusyFile(project.id, fileName);
+		});
+
+		ternServers[project.id].on('invalidate', function(fileNames, count) {
+			reanalysisStats.changes++;
+			reanalysisStats.files += count;
+			reanalyzed += count;
+		});
+
+		// versions of dirty views that server has, by file name
+		ternServers[project.id].versions = {};
+
+		var symbols = ternServers[project.id].symbols = new SymbolIndex();
+		ternServers[project.id].on('afterLoad', function(file) {
+			symbols.add(file);
+		});
+		// symbols of changed and removed files are outdated,
+		// dependents keep theirs until they are analyzed again
+		ternServers[project.id].on('invalidate', function(fileNames) {
+			symbols.remove(fileNames);
+		});
+		ternServers[project.id].on('reset', function() {
+			symbols.clear();
+		});
+
+		// condensed types of warm-started file are replaced
+		// with types of its current contents
+		ternServers[project.id].on('beforeLoad', function(file) {
+			purgeCondensed(this, file.name);
+		});
 	}
 
 	if (project.files) {
-		var updated = syncFiles(ternServers[project.id], project.files);
-		// if (updated) {
-		// 	// server was updated. Initiate a fake request 
-		// 	// to make sure that first completions request won't take
-		// 	// too much time
-		// 	var req = buildFakeRequest();
-		// 	ternServers[project.id].request(req, function() {});
-		// }
+		// files are analyzed later, by `ternWarmUp()` slices
+		// or by first request
+		syncFiles(ternServers[project.id], project.files);
 	}
 }
 
+/**
+ * Adds given defs to running server of given project, e.g. defs
+ * of npm dependencies generated after server was started. Server
+ * is reset, so its files are analyzed again with new defs
+ * @param {String} projectId
+ * @param {Array}  defs List of defs as JSON strings
+ * @return {Boolean} `false` if there's no such server
+ */
+function addServerDefs(projectId, defs) {
+	var server = ternServers[projectId];
+	if (!server) {
+		return false;
+	}
+
+	var stale = {};
+	_.each(_.toArray(defs), function(d) {
+		d = _.isString(d) ? JSON.parse(d) : d;
+		server.defs.push(d);
+
+		// modules required before their defs were available
+		// were added to server as empty files
+		var modules = _.extend({}, d['!node'], d['!define'] && d['!define']['!node']);
+		_.each(modules, function(v, name) {
+			name = name.replace(/`/g, '.');
+			if (server.findFile(name)) {
+				stale[name] = true;
+			}
+		});
+	});
+
+	if (!_.isEmpty(stale)) {
+		server.delFiles(stale);
+	}
+	server.reset();
+	return true;
+}
+
+/**
+ * Analyzes files of given project that are not analyzed yet,
+ * for given time slice at most. Returns JSON string with number
+ * of analyzed and total files or `null` if there's no such server
+ * @param  {String} projectId
+ * @param  {Number} slice Time slice, in milliseconds
+ * @return {String}
+ */
+function ternWarmUp(projectId, slice) {
+	var server = ternServers[projectId];
+	if (!server) {
+		return null;
+	}
+
+	var left = server.analyzePending(+new Date + (+slice || 0));
+	return JSON.stringify({
+		analyzed: server.files.length - left,
+		total: server.files.length
+	});
+}
+
 /**
  * Builds fake request to TernJS server to reload
  * files state
@@ -90,7 +269,11 @@ function killServer(project) {
 	var server = ternServers[serverId];
 	if (server) {
 		server.reset();
+		server.killed = true;
+		parseCache.release(server);
 		delete ternServers[serverId];
+		delete completionsCache[serverId];
+		delete resultCache[serverId];
 	}
 }
 
@@ -105,66 +288,322 @@ function hasServer(id) {
 }
 
 /**
- * Sync project files with active server
- * @param  {tern.Server} server Server instance to update
- * @param  {Array} files  Actual project file list
+ * Returns JSON string with file count and total source size
+ * of every running server, used to estimate servers heap cost
+ * @return {String}
  */
-function syncFiles(server, files) {
-	var loadedFiles = [];
-	if (server.files) {
-		loadedFiles = _.pluck(server.files, 'name');
-	}
+function serverInfo() {
+	var result = {};
+	_.each(ternServers, function(server, id) {
+		var bytes = 0;
+		_.each(server.files, function(f) {
+			bytes += f.text ? f.text.length : 0;
+		});
+		result[id] = {files: server.files.length, bytes: bytes};
+	});
 
-	var toAdd = _.difference(files, loadedFiles);
-	var toRemove = _.difference(loadedFiles, files);
+	return JSON.stringify(result);
+}
 
-	_.each(toAdd, function(f) {
-		server.addFile(f);
+/**
+ * Returns JSON string with memory estimates of every running server:
+ * file counts, source size, number of objects and abstract values
+ * in its type graph and number of indexed symbols
+ * @return {String}
+ */
+function memoryInfo() {
+	var result = {};
+	_.each(ternServers, function(server, id) {
+		var bytes = 0, analyzed = 0;
+		_.each(server.files, function(f) {
+			bytes += f.text ? f.text.length : 0;
+			analyzed += f.scope ? 1 : 0;
+		});
+
+		result[id] = _.extend({
+			files: server.files.length,
+			analyzed: analyzed,
+			bytes: bytes,
+			symbols: server.symbols.size()
+		}, countTypes(server));
 	});
 
-	_.each(toRemove, function(f) {
-		server.delFile(f);
+	return JSON.stringify({servers: result, parse: parseCache.stats()});
+}
+
+/**
+ * Counts objects and abstract values reachable from file scopes
+ * and modules of given server. Locals of functions are not
+ * reachable this way, so it's a lower bound
+ * @param  {tern.Server} server
+ * @return {Object}
+ */
+function countTypes(server) {
+	var types = 0, avals = 0;
+	walkTypes(server, function(x) {
+		if (x instanceof tern.AVal) {
+			avals++;
+		} else {
+			types++;
+		}
 	});
 
-	if (toRemove.length) {
-		server.reset();
+	return {types: types, avals: avals};
+}
+
+/**
+ * Calls given function for every object and abstract value
+ * reachable from file scopes and modules of given server
+ * @param  {tern.Server} server
+ * @param  {Function}    fn
+ */
+function walkTypes(server, fn) {
+	var seen = typeof Set == 'function' ? new Set() : null;
+	var marker = {}, stack = [];
+
+	var visit = function(x) {
+		if (!x || x === tern.ANull) {
+			return;
+		}
+
+		if (seen) {
+			if (seen.has(x)) {
+				return;
+			}
+			seen.add(x);
+		} else {
+			if (x._walkMark === marker) {
+				return;
+			}
+			x._walkMark = marker;
+		}
+		stack.push(x);
+	};
+
+	visit(server.cx.topScope);
+	_.each(server.files, function(f) {
+		visit(f.scope);
+	});
+	if (server._node) {
+		_.each(server._node.modules, visit);
+	}
+
+	while (stack.length) {
+		var x = stack.pop();
+		if (x instanceof tern.AVal) {
+			fn(x);
+			_.each(x.types, visit);
+		} else if (x instanceof tern.Obj) {
+			fn(x);
+			for (var p in x.props) {
+				visit(x.props[p]);
+			}
+			visit(x.proto);
+			// parent of a scope
+			visit(x.prev);
+			if (x instanceof tern.Fn) {
+				visit(x.self);
+				visit(x.retval);
+				_.each(x.args, visit);
+			}
+		}
 	}
+}
+
+/**
+ * Types loaded from condensed defs (warm start) have origin of these
+ * defs. Types with span of project file are tagged with name of that
+ * file instead, so they are purged like types of analyzed file.
+ * Returns dict of files with such types
+ * @param  {tern.Server} server
+ * @return {Object}
+ */
+function tagCondensedOrigins(server) {
+	var files = {};
+	walkTypes(server, function(x) {
+		var m = x.span && /^(.+)@\d/.exec(x.span);
+		if (m && x.origin != m[1]) {
+			x.origin = m[1];
+			files[m[1]] = true;
+		}
+	});
 
-	return toAdd.length || toRemove.length;
+	return files;
 }
 
-function getFile(file, project, callback) {
-	// log('Requesting file ' + file);
-	return sublimeReadFile(file, project) || '';
-	// callback(null, content);
-	// return content;
+/**
+ * Purges types of given file loaded from condensed defs, so they
+ * don't outlive changes of analyzed file. Must be called within
+ * server inference context
+ * @param  {tern.Server} server
+ * @param  {String}      fileName
+ */
+function purgeCondensed(server, fileName) {
+	if (server.condensedCx !== server.cx) {
+		// defs are loaded again after server reset
+		server.condensedCx = server.cx;
+		server.condensedFiles = tagCondensedOrigins(server);
+	}
+
+	if (server.condensedFiles[fileName]) {
+		delete server.condensedFiles[fileName];
+		server.timing.typesPurged += tern.purgeTypes(fileName);
+		server.signal('purge', fileName);
+	}
+}
+
+/**
+ * Condenses types inferred by project server into a defs object that
+ * can be loaded later instead of analyzing project files again.
+ * Only analyzed files are condensed, as well as previously loaded
+ * condensed defs with given name
+ * @param  {String} projectId
+ * @param  {String} name Name of resulting defs
+ * @return {String} JSON with `defs` and list of condensed `files`
+ */
+function condenseServer(projectId, name) {
+	var server = ternServers[projectId];
+	if (!server) {
+		return null;
+	}
+
+	var files = _.pluck(_.filter(server.files, function(f) {
+		return !!f.scope;
+	}), 'name');
+
+	// types of condensed defs are tagged with their files,
+	// see `tagCondensedOrigins()`
+	var condensed = server.condensedCx === server.cx ? _.keys(server.condensedFiles) : [];
+	var origins = _.filter(server.cx.origins, function(o) {
+		return o == name;
+	}).concat(condensed, files);
+
+	if (!origins.length) {
+		return null;
+	}
+
+	var defs;
+	tern.withContext(server.cx, function() {
+		defs = tern.condense(origins, name, {spanOrigins: true});
+	});
+
+	return JSON.stringify({files: files, defs: defs});
+}
+
+/**
+ * Analyzes main file of npm package, with all package files it
+ * requires, in a scratch server and condenses inferred types into
+ * defs for node plugin. Package module is available in defs under
+ * package name, other package modules are prefixed with it
+ * @param  {String} data JSON with package `name`, `dir` and `main` file
+ * @param  {Array}  libs Defs to analyze package with
+ * @return {String} JSON of condensed defs
+ */
+function condensePackage(data, libs) {
+	data = JSON.parse(data);
+	var project = {id: data.dir + '/package.json', dir: data.dir, config: {}};
+	loadPlugin(JSON.stringify({pluginId: 'node'}), project);
+	var server = new tern.Server({
+		getFile: function(name) {
+			return sublimeReadFile(name, project) || '';
+		},
+		defs: _.map(_.toArray(libs), function(v) {
+			return _.isString(v) ? JSON.parse(v) : v;
+		}),
+		plugins: {node: {}},
+		async: false,
+		projectDir: data.dir
+	});
+
+	server.addFile(data.main);
+	var defs;
+	server.flush(function() {
+		var origins = _.pluck(_.filter(server.files, function(f) {
+			return !!f.scope;
+		}), 'name');
+		tern.withContext(server.cx, function() {
+			// package files are not project files, so spans are useless
+			defs = tern.condense(origins, 'node_modules/' + data.name, {spans: false});
+		});
+	});
+
+	// rename package modules so they don't clash with project ones.
+	// Type parser reads only word characters in references, so modules
+	// get safe names and package name refers to main module
+	var mainKey = data.main.replace(/^\.\//, '').replace(/\./g, '`');
+	var safeName = function(key) {
+		return (data.name + '/' + key).replace(/[^\w$]/g, '$');
+	};
+
+	// node plugin puts modules into `!define` section
+	var define = defs['!define'] || (defs['!define'] = {});
+	var modules = define['!node'] || {};
+	var renamed = define['!node'] = {};
+	_.each(modules, function(v, key) {
+		renamed[safeName(key)] = v;
+	});
+	renamed[data.name.replace(/\./g, '`')] = mainKey in modules ? '!node.' + safeName(mainKey) : {};
+
+	// update references to renamed modules
+	return JSON.stringify(defs).replace(/!node\.([^.,:\s()\[\]"|<>]+)/g, function(m, key) {
+		return key in modules ? '!node.' + safeName(key) : m;
+	});
 }
 
 /**
- * Returns reference to registered document from given
- * view object
- * @param  {sublime.View} view 
- * @return {Objec}
+ * Sync project files with active server
+ * @param  {tern.Server} server Server instance to update
+ * @param  {Array} files  Actual project file list
  */
-function docFromView(view) {
-	var fileName = sublimeGetFileNameFromView(view);
-	return _.find(ternDocs, function(d) {
-		return d.name == fileName;
+function syncFiles(server, files) {
+	var loaded = {}, actual = {};
+	_.each(server.files || [], function(f) {
+		loaded[f.name] = true;
 	});
+
+	var added = 0;
+	_.each(files, function(f) {
+		actual[f] = true;
+		if (!loaded.hasOwnProperty(f)) {
+			server.addFile(f);
+			added++;
+		}
+	});
+
+	var toRemove = {}, removed = 0;
+	_.each(loaded, function(v, f) {
+		if (!actual.hasOwnProperty(f)) {
+			toRemove[f] = true;
+			removed++;
+		}
+	});
+
+	if (removed) {
+		// purges types of removed files only, inference
+		// results for the rest of the project are kept
+		server.delFiles(toRemove);
+	}
+
+	return added || removed;
 }
 
-function buildRequest(view, query, allowFragments) {
+/**
+ * Builds TernJS request
+ * @param  {Object} state View state, see `view_state()` in tern.py
+ * @param  {Object} query TernJS query or its type
+ * @return {Object}
+ */
+function buildRequest(state, query, allowFragments) {
 	var files = [], offset = 0, startPos, endPos;
-	var sel = view.sel()[0];
 
 	if (typeof query == "string") {
 		query = {type: query};
 	}
 
 	if (query.end == null && query.start == null) {
-		query.end = endPos = sel.end();
-		if (!sel.empty()) {
-			query.start = startPos = sel.begin();
+		query.end = endPos = state.end;
+		if (state.start != state.end) {
+			query.start = startPos = state.start;
 		}
 	} else {
 		endPos = query.end;
@@ -178,13 +617,12 @@ function buildRequest(view, query, allowFragments) {
 		startPos = endPos;
 	}
 	
-	var fileName = sublimeGetFileNameFromView(view);
-	query.file = fileName;
-	if (view.is_dirty()) {
+	query.file = state.file;
+	if (state.dirty) {
 		files.push({
-			name: fileName,
+			name: state.file,
 			type: 'full',
-			text: sublimeViewContents(view)
+			text: state.text
 		});
 		query.file = '#' + (files.length - 1);
 	}
@@ -198,6 +636,43 @@ function buildRequest(view, query, allowFragments) {
 	};
 }
 
+/**
+ * Uploads full files of given request to server and removes them
+ * from request, so query can be matched against result cache by
+ * file version. Files with unchanged text don't invalidate anything
+ * @param  {tern.Server} server
+ * @param  {Object} request
+ * @return {Number} Server generation produced by upload
+ */
+function uploadFiles(server, request) {
+	var files = request.files || [];
+	if (!files.length || _.some(files, function(f) {return f.type != 'full';})) {
+		return server.generation;
+	}
+
+	var generation = server.generation;
+	_.each(files, function(f) {
+		server.addFile(f.name, f.text);
+	});
+
+	if (server.generation != generation) {
+		// let server reset itself after too many updates
+		server.uses++;
+	}
+
+	var m = request.query && /^#(\d+)$/.exec(request.query.file);
+	if (m && files[+m[1]]) {
+		request.query.file = files[+m[1]].name;
+	}
+	request.files = [];
+	return server.generation;
+}
+
+function resultCacheKey(server, query) {
+	var file = query && query.file && server.findFile(query.file);
+	return file ? JSON.stringify([file.version, query]) : null;
+}
+
 function sendRequest(request, projectId) {
 	var server = ternServers[projectId];
 	var res = null;
@@ -206,6 +681,30 @@ function sendRequest(request, projectId) {
 		return null;
 	}
 
+	if (busyFile) {
+		setBusyFile(null, null);
+	}
+
+	uploadFiles(server, request);
+	var key = resultCacheKey(server, request.query);
+	var cache = resultCache[projectId];
+	if (key) {
+		if (!cache || cache.server !== server || cache.generation != server.generation) {
+			cache = resultCache[projectId] = {
+				server: server, 
+				generation: server.generation, 
+				entries: {}, 
+				size: 0
+			};
+		}
+
+		if (key in cache.entries) {
+			resultCacheStats.hits++;
+			return cache.entries[key];
+		}
+		resultCacheStats.misses++;
+	}
+
 	server.request(request, function(error, data) {
 		if (error) {
 			throw error;
@@ -213,50 +712,316 @@ function sendRequest(request, projectId) {
 
 		res = data;
 	});
+
+	if (key && res && !server.skipped && cache.generation == server.generation) {
+		if (cache.size >= RESULT_CACHE_SIZE) {
+			cache.entries = {};
+			cache.size = 0;
+		}
+		cache.entries[key] = res;
+		cache.size++;
+	}
 	
 	return res;
 }
 
-function forceFileUpdate(view, projectId) {
-	if (!(projectId in ternServers)) {
-		return;
+/**
+ * Returns JSON of query result cache and reanalysis counters
+ * @return {String}
+ */
+function queryStats() {
+	var size = 0;
+	_.each(resultCache, function(cache) {
+		size += cache.size;
+	});
+	return JSON.stringify({
+		results: _.extend({size: size}, resultCacheStats),
+		parse: parseCache.stats(),
+		reanalysis: reanalysisStats
+	});
+}
+
+/**
+ * Returns top-level symbols of project files whose names start with
+ * given prefix. Only files analyzed so far or described by condensed
+ * defs are searched
+ * @param  {String} projectId
+ * @param  {String} prefix
+ * @param  {Number} limit Max number of symbols
+ * @return {String} JSON list of symbols
+ */
+function ternSymbols(projectId, prefix, limit) {
+	var server = ternServers[projectId];
+	if (!server) {
+		return null;
 	}
-	
+
+	if (!server.symbols.condensed) {
+		// defs are loaded again after server reset,
+		// so their symbols are collected on demand
+		tern.withContext(server.cx, function() {
+			server.symbols.addCondensed(server.cx.topScope);
+		});
+	}
+
+	return JSON.stringify(server.symbols.search(prefix, limit));
+}
+
+/**
+ * Runs TernJS query described by given JSON string with `project` id,
+ * `query` object and `view` state (see `view_state()` in tern.py).
+ * Returns query result as JSON string, so query data crosses
+ * Python/JS bridge once in each direction
+ * @param  {String} data
+ * @return {String}
+ */
+function ternQuery(data) {
+	data = JSON.parse(data);
+	var server = ternServers[data.project];
+	var state = data.view;
+	if (state.dirty && state.text == null) {
+		// plugin skips text of view version that server already has
+		var known = server && server.versions[state.file] === state.version && server.findFile(state.file);
+		if (!known) {
+			return JSON.stringify({needText: true});
+		}
+		state.text = known.text;
+	}
+
+	var req = buildRequest(state, data.query);
+	if (data.deadline) {
+		req.request.timeout = data.deadline;
+	}
+
+	var started = +new Date;
+	if (server) {
+		server.skipped = 0;
+		server.resetTiming();
+	}
+
+	var res = req.request.query.type == 'completions'
+		? completionsQuery(data, req)
+		: sendRequest(req.request, data.project);
+
+	if (res && server && server.skipped) {
+		// deadline passed before all files were analyzed
+		res.skipped = server.skipped;
+	}
+
+	if (res && server) {
+		// result may be a cached object, so timing is added to its copy
+		res = _.extend({}, res, {
+			timing: _.extend({total: +new Date - started}, server.timing),
+			synced: isSynced(server, state)
+		});
+	}
+
+	return JSON.stringify(res);
+}
+
+/**
+ * Check if server has the same text of dirty view as given view
+ * state and remembers its version if so. Completions taken from
+ * cache don't update server file
+ * @param  {tern.Server} server
+ * @param  {Object} state
+ * @return {Boolean}
+ */
+function isSynced(server, state) {
+	if (!state.dirty || state.version == null) {
+		return false;
+	}
+
+	var file = server.findFile(state.file);
+	if (file && file.text === state.text) {
+		server.versions[state.file] = state.version;
+		return true;
+	}
+
+	delete server.versions[state.file];
+	return false;
+}
+
+/**
+ * Runs completions query with server-side filtering by typed prefix,
+ * optional fuzzy ranking and result cap (`data.completions` options).
+ * Unfiltered completions list is cached for current word start
+ * so further typing narrows it down without new TernJS query,
+ * until any file of project server is changed
+ * @param  {Object} data Query data, see `ternQuery()`
+ * @param  {Object} req  TernJS request for this query
+ * @return {Object}
+ */
+function completionsQuery(data, req) {
+	var opt = data.completions || {};
+	var state = data.view;
+	var server = ternServers[data.project];
+	var cached = completionsCache[data.project];
+	var res, fromCache = false;
+
+	if (cached && cached.server === server && cached.file == state.file 
+		&& cached.generation == server.generation && state.dirty && state.end >= cached.res.start
+		&& state.text.slice(0, cached.res.start) === cached.head
+		&& /^[\w$]*$/.test(state.text.slice(cached.res.start, state.end))) {
+		res = cached.res;
+		fromCache = true;
+	} else {
+		req.request.query.filter = false;
+		res = sendRequest(req.request, data.project);
+		if (!res) {
+			return null;
+		}
+
+		// do not reuse partial results
+		completionsCache[data.project] = state.dirty && !server.skipped ? {
+			server: server,
+			generation: server.generation,
+			file: state.file,
+			head: state.text.slice(0, res.start),
+			res: res
+		} : null;
+	}
+
+	var text = state.dirty ? state.text : fileText(server, state.file);
+	var word = text.slice(res.start, state.end);
+	var list = filterCompletions(res.completions, word, opt.fuzzy);
+
+	if (!list.length && word.length >= 2) {
+		// nothing found: let TernJS guess properties by typed word
+		delete req.request.query.filter;
+		if (!fromCache) {
+			// file is already updated by previous request
+			req.request.files = [];
+			req.request.query.file = state.file;
+		}
+		var generation = uploadFiles(server, req.request);
+		var guessed = sendRequest(req.request, data.project);
+		list = guessed ? guessed.completions : [];
+		if (fromCache && server.generation == generation) {
+			// only current file is updated, cached list is still valid
+			cached.generation = generation;
+		}
+	}
+
+	if (opt.limit && list.length > opt.limit) {
+		list = list.slice(0, opt.limit);
+	}
+
+	return formatHints({start: res.start, end: state.end, completions: list}, req);
+}
+
+function fileText(server, fileName) {
+	var file = server && server.findFile(fileName);
+	return file && file.text || '';
+}
+
+/**
+ * Filters completions by given prefix. With `fuzzy` option,
+ * completions that contain all prefix characters in the same order
+ * are included too and list is ranked by match quality
+ * @param  {Array}   completions
+ * @param  {String}  word
+ * @param  {Boolean} fuzzy
+ * @return {Array}
+ */
+function filterCompletions(completions, word, fuzzy) {
+	if (!word) {
+		return completions;
+	}
+
+	if (!fuzzy) {
+		return _.filter(completions, function(c) {
+			return c.name.indexOf(word) === 0;
+		});
+	}
+
+	var lword = word.toLowerCase();
+	var scored = [];
+	_.each(completions, function(c, i) {
+		var score = fuzzyScore(c.name, lword);
+		if (score > 0) {
+			scored.push({score: score, ix: i, item: c});
+		}
+	});
+
+	scored.sort(function(a, b) {
+		return b.score - a.score || a.ix - b.ix;
+	});
+
+	return _.pluck(scored, 'item');
+}
+
+/**
+ * Returns score of fuzzy match of lowercase `word` against `name`:
+ * 0 if name doesn't contain all word characters in the same order.
+ * Prefix matches and consecutive characters score higher
+ * @param  {String} name
+ * @param  {String} word
+ * @return {Number}
+ */
+function fuzzyScore(name, word) {
+	var lname = name.toLowerCase();
+	if (lname.indexOf(word) === 0) {
+		return 1000 + (name.indexOf(word) === 0 ? 1 : 0) - name.length / 1000;
+	}
+
+	var score = 1, pos = -1, streak = 0;
+	for (var i = 0; i < word.length; i++) {
+		var next = lname.indexOf(word.charAt(i), pos + 1);
+		if (next == -1) {
+			return 0;
+		}
+
+		streak = next == pos + 1 ? streak + 1 : 0;
+		score += 1 + streak * 2 + (next === 0 ? 3 : 0);
+		pos = next;
+	}
+
+	return score - name.length / 1000;
+}
+
+/**
+ * Updates file contents from given JSON string with
+ * `project` id and `view` state. Changed file and files that
+ * depend on it are analyzed again. Returns JSON with number
+ * of re-analyzed dependents
+ * @param  {String} data
+ * @return {String}
+ */
+function ternUpdateFile(data) {
+	data = JSON.parse(data);
+	if (!(data.project in ternServers)) {
+		return null;
+	}
+
 	var req = buildFakeRequest();
 	req.files.push({
-		name: sublimeGetFileNameFromView(view),
+		name: data.view.file,
 		type: 'full',
-		text: sublimeViewContents(view)
+		text: data.view.text
 	});
-	ternServers[projectId].request(req, function() {});
-}
-
-function ternHints(view, projectId, callback) {
-	var req = buildRequest(view, {type: "completions", types: true});
-	var res = sendRequest(req.request, projectId);
-	if (res) {
-		var completions = _.map(res.completions, function(completion) {
-			return {
-				text: completion.name,
-				type: completion.type,
-				guess: !!res.guess
-			};
-		});
+	reanalyzed = 0;
+	var server = ternServers[data.project], started = +new Date;
+	server.resetTiming();
+	server.request(req, function() {});
+	return JSON.stringify({
+		reanalyzed: reanalyzed,
+		timing: _.extend({total: +new Date - started}, server.timing)
+	});
+}
 
+function formatHints(res, req) {
+	var completions = _.map(res.completions, function(completion) {
 		return {
-			from: res.from + req.offset,
-			to: res.to + req.offset,
-			list: completions
+			text: completion.name,
+			type: completion.type,
+			guess: !!(completion.guess || res.guess)
 		};
-	}
-}
-
-function ternJumpToDefinition(view, projectId) {
-	var req = buildRequest(view, "definition", false);
-	return sendRequest(req.request, projectId);
-}
+	});
 
-function ternFindRefs(view, projectId) {
-	var req = buildRequest(view, "refs", false);
-	return sendRequest(req.request, projectId);
+	return {
+		from: res.start + req.offset,
+		to: res.end + req.offset,
+		list: completions
+	};
 }
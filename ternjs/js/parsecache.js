@@ -0,0 +1,159 @@
+/**
+ * Syntax trees of parsed files, shared by all TernJS servers of
+ * JS context. Trees are keyed by file name, content hash and plugins
+ * that post-process them, so a server that is started again for
+ * the same project reuses trees of unchanged files instead of
+ * parsing them.
+ *
+ * Analysis stores scopes on tree nodes, so a tree is used by
+ * single live server at a time
+ */
+function ParseCache(maxSize) {
+	this.maxSize = maxSize || 0;
+	this.size = 0;
+	this.hits = 0;
+	this.misses = 0;
+	this.clear();
+}
+
+ParseCache.prototype = {
+	clear: function() {
+		this.entries = {};
+		this.count = 0;
+		this.size = 0;
+		// circular doubly linked list, most recently used entry
+		// is right before root
+		this.root = {key: null};
+		this.root.prev = this.root.next = this.root;
+	},
+
+	/**
+	 * Returns syntax tree of given file contents for given server,
+	 * parses contents if there's no such tree in cache
+	 * @param  {String} name   File name
+	 * @param  {String} text   File contents
+	 * @param  {tern.Server} server
+	 * @return {Object}
+	 */
+	parse: function(name, text, server) {
+		if (!this.maxSize) {
+			this.misses++;
+			return tern.parse(text, server.passes, {directSourceFile: {name: name, text: text}});
+		}
+
+		var key = [pluginsKey(server), name, hashText(text)].join('\n');
+		var entry = this.entries[key];
+		if (entry && entry.text === text && (entry.owner === server || !entry.owner || entry.owner.killed)) {
+			this.hits++;
+			this._unlink(entry);
+		} else {
+			this.misses++;
+			if (entry) {
+				this._remove(entry);
+			}
+
+			entry = {
+				key: key,
+				text: text,
+				// lightweight source file instead of server file,
+				// so tree doesn't retain server that parsed it
+				ast: tern.parse(text, server.passes, {directSourceFile: {name: name, text: text}})
+			};
+			this.entries[key] = entry;
+			this.count++;
+			this.size += text.length;
+		}
+
+		entry.owner = server;
+		this._append(entry);
+
+		while (this.size > this.maxSize && this.root.next !== entry) {
+			this._remove(this.root.next);
+		}
+
+		return entry.ast;
+	},
+
+	_append: function(entry) {
+		var last = this.root.prev;
+		last.next = this.root.prev = entry;
+		entry.prev = last;
+		entry.next = this.root;
+	},
+
+	_unlink: function(entry) {
+		entry.prev.next = entry.next;
+		entry.next.prev = entry.prev;
+	},
+
+	_remove: function(entry) {
+		this._unlink(entry);
+		delete this.entries[entry.key];
+		this.count--;
+		this.size -= entry.text.length;
+	},
+
+	/**
+	 * Releases trees used by given stopped server. Analysis data
+	 * is removed from trees, so they don't retain stopped server
+	 * @param  {tern.Server} server
+	 */
+	release: function(server) {
+		for (var entry = this.root.next; entry !== this.root; entry = entry.next) {
+			if (entry.owner === server) {
+				scrubTree(entry.ast);
+				entry.owner = null;
+			}
+		}
+	},
+
+	stats: function() {
+		return {
+			hits: this.hits,
+			misses: this.misses,
+			size: this.count,
+			bytes: this.size
+		};
+	}
+};
+
+function pluginsKey(server) {
+	if (server._pluginsKey == null) {
+		server._pluginsKey = _.keys(server.options.plugins || {}).sort().join(',');
+	}
+	return server._pluginsKey;
+}
+
+/**
+ * Returns 32-bit FNV-1a hash of given string, combined with its length
+ * @param  {String} text
+ * @return {String}
+ */
+function hashText(text) {
+	var hash = 0x811c9dc5;
+	for (var i = 0, il = text.length; i < il; i++) {
+		hash ^= text.charCodeAt(i);
+		hash += (hash << 1) + (hash << 4) + (hash << 7) + (hash << 8) + (hash << 24);
+	}
+	return text.length + ':' + (hash >>> 0).toString(16);
+}
+
+/**
+ * Removes data stored on syntax tree nodes during analysis
+ * @param  {Object} ast
+ */
+function scrubTree(ast) {
+	acorn.walk.simple(ast, {
+		Function: function(node) {
+			node.body.scope = null;
+		},
+		ObjectExpression: function(node) {
+			node.objType = null;
+		},
+		CallExpression: function(node) {
+			if (node.arguments.length) {
+				node.arguments[0].required = null;
+			}
+		}
+	});
+}
@@ -0,0 +1,165 @@
+/**
+ * Index of top-level symbols of project files, collected from file
+ * scopes right after file is analyzed. Files that are not analyzed
+ * since they are described by condensed defs (warm start) are indexed
+ * from spans of these defs. Symbols are kept sorted by name so lookup
+ * is a prefix search that doesn't touch inference engine
+ */
+function SymbolIndex() {
+	this.clear();
+}
+
+SymbolIndex.prototype = {
+	clear: function() {
+		this.files = {};
+		this.sorted = null;
+		this.condensed = false;
+	},
+
+	/**
+	 * Collects symbols defined by given analyzed file. Must be called
+	 * within server inference context
+	 * @param  {tern.File} file
+	 */
+	add: function(file) {
+		var symbols = [];
+		for (var s = file.scope; s; s = s.prev) {
+			_.each(s.props, function(prop, name) {
+				// symbols of condensed defs keep their origin
+				// when file is analyzed again
+				var node = prop.originNode;
+				var own = prop.origin == file.name || parseSpan(prop.span).file == file.name;
+				if (!own || !node || node.start == null) {
+					return;
+				}
+
+				symbols.push(makeSymbol(name, prop, file.name, node.start, node.end));
+			});
+		}
+
+		this.files[file.name] = symbols;
+		this.sorted = null;
+	},
+
+	/**
+	 * Collects symbols of files described by condensed defs loaded
+	 * into given scope: their spans are prefixed with file name.
+	 * Files that are already indexed are skipped. Must be called
+	 * within server inference context
+	 * @param  {tern.Scope} scope
+	 */
+	addCondensed: function(scope) {
+		var files = {};
+		_.each(scope.props, function(prop, name) {
+			var span = parseSpan(prop.span);
+			if (span.file) {
+				(files[span.file] || (files[span.file] = [])).push(makeSymbol(name, prop, span.file, span.start, span.end));
+			}
+		});
+
+		_.each(files, function(symbols, fileName) {
+			if (!(fileName in this.files)) {
+				this.files[fileName] = symbols;
+			}
+		}, this);
+
+		this.condensed = true;
+		this.sorted = null;
+	},
+
+	/**
+	 * Removes symbols of given files
+	 * @param  {Array} names File names
+	 */
+	remove: function(names) {
+		var self = this;
+		_.each(names, function(name) {
+			if (name in self.files) {
+				delete self.files[name];
+				self.sorted = null;
+			}
+		});
+	},
+
+	/**
+	 * Returns symbols whose names start with given prefix,
+	 * case-insensitive
+	 * @param  {String} prefix
+	 * @param  {Number} limit Max number of symbols to return
+	 * @return {Array}
+	 */
+	search: function(prefix, limit) {
+		if (!this.sorted) {
+			this.sorted = _.sortBy(_.flatten(_.values(this.files), true), 'key');
+		}
+
+		var list = this.sorted;
+		var key = (prefix || '').toLowerCase();
+		var lo = 0, hi = list.length;
+		while (lo < hi) {
+			var mid = (lo + hi) >> 1;
+			if (list[mid].key < key) {
+				lo = mid + 1;
+			} else {
+				hi = mid;
+			}
+		}
+
+		var result = [];
+		for (var i = lo; i < list.length && list[i].key.indexOf(key) === 0; i++) {
+			if (limit && result.length >= limit) {
+				break;
+			}
+			result.push(_.omit(list[i], 'key'));
+		}
+
+		return result;
+	},
+
+	size: function() {
+		return _.reduce(this.files, function(memo, symbols) {
+			return memo + symbols.length;
+		}, 0);
+	}
+};
+
+/**
+ * Parses span of condensed defs, prefixed with name of its file
+ * @param  {String} span
+ * @return {Object} Object with `file`, `start` and `end` of span,
+ * empty if span has no file name
+ */
+function parseSpan(span) {
+	var m = span && /^(.+)@(\d+)\[\d+:\d+\]-(\d+)\[/.exec(span);
+	return m ? {file: m[1], start: +m[2], end: +m[3]} : {};
+}
+
+function makeSymbol(name, prop, fileName, start, end) {
+	var type = prop.getType(false);
+	return {
+		name: name,
+		key: name.toLowerCase(),
+		kind: symbolKind(name, type),
+		file: fileName,
+		start: start,
+		end: end,
+		type: type ? tern.toString(type, 1) : '?'
+	};
+}
+
+function symbolKind(name, type) {
+	if (type instanceof tern.Fn) {
+		var proto = type.hasProp('prototype', false);
+		var protoType = proto && proto.getType(false);
+		if (/^[A-Z]/.test(name) || (protoType && !_.isEmpty(protoType.props))) {
+			return 'class';
+		}
+		return 'function';
+	}
+
+	if (type instanceof tern.Obj && !(type instanceof tern.Arr)) {
+		return 'object';
+	}
+
+	return 'variable';
+}
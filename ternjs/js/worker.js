@@ -0,0 +1,289 @@
+/**
+ * Out-of-process TernJS host.
+ *
+ * Loads the same core files as the PyV8 context into a sandbox and
+ * serves `controller.js` API (`startServer`, `ternQuery`, `ternUpdateFile`...)
+ * over newline-delimited JSON-RPC on stdin/stdout. Incoming requests are
+ * queued and executed one at a time, so Python side may pipeline requests
+ * and cancel the ones that are not started yet.
+ *
+ * Usage: node worker.js file1.js file2.js ...
+ * (file paths are relative to `ternjs` folder)
+ */
+var fs = require('fs');
+var path = require('path');
+var vm = require('vm');
+var readline = require('readline');
+var v8 = require('v8');
+
+var basePath = path.resolve(__dirname, '..');
+var queue = [];
+var cancelled = {};
+var scheduled = false;
+// evaluated plugin paths and their definitions
+var loadedPlugins = {};
+var failedPlugins = {};
+
+function send(message) {
+	process.stdout.write(JSON.stringify(message) + '\n');
+}
+
+function log(message) {
+	send({method: 'log', params: [String(message)]});
+}
+
+function fileExists(filePath) {
+	try {
+		return fs.statSync(filePath).isFile();
+	} catch (e) {
+		return false;
+	}
+}
+
+/**
+ * Node counterpart of `ternjs_file_reader()` from `tern.py`
+ * @param  {String} name    File name requested by TernJS
+ * @param  {Object} project Project info
+ * @return {String}
+ */
+function readFile(name, project) {
+	if (name.charAt(0) == '{' && name.charAt(name.length - 1) == '}') {
+		// unsaved buffer: its contents are always passed with request
+		return '';
+	}
+
+	var filePath = name;
+	if (!path.isAbsolute(filePath) && project && project.dir) {
+		filePath = path.join(project.dir, filePath);
+	}
+
+	if (!fileExists(filePath) && project && project.config) {
+		var found = false;
+		['.js', '.json'].forEach(function(ext) {
+			if (!found && fileExists(filePath + ext)) {
+				found = true;
+				filePath += ext;
+			}
+		});
+
+		if (!found) {
+			// might be a RequireJS module
+			var projPath = path.dirname(project.id);
+			if (filePath.charAt(0) == '/') {
+				filePath = filePath.substr(1);
+			}
+
+			var lookupPaths = [projPath].concat((project.config.paths || []).map(function(p) {
+				return path.isAbsolute(p) ? p : path.join(projPath, p);
+			}));
+
+			for (var i = 0; i < lookupPaths.length; i++) {
+				if (fileExists(path.join(lookupPaths[i], filePath))) {
+					filePath = path.join(lookupPaths[i], filePath);
+					break;
+				}
+			}
+		}
+	}
+
+	try {
+		return fs.readFileSync(filePath, 'utf8');
+	} catch (e) {
+		log(e);
+		return null;
+	}
+}
+
+/**
+ * Returns definitions shipped with plugin as JSON string
+ */
+function loadDefinitions(pluginPath) {
+	try {
+		var defs = fs.readFileSync(pluginPath.replace(/\.js$/, '.json'), 'utf8');
+		JSON.parse(defs);
+		return defs;
+	} catch (e) {
+		return null;
+	}
+}
+
+/**
+ * Node counterpart of `tern_plugin.get_plugin()`: locates and evaluates
+ * plugin file, returns plugin descriptor
+ */
+function loadPlugin(data, project) {
+	data = JSON.parse(data);
+	var pluginFile = data.pluginId + '.js';
+	var projectPath = project && project.id != 'empty' ? path.dirname(project.id) : null;
+	var paths = [];
+
+	if (data.pluginPath) {
+		paths.push(projectPath ? path.join(projectPath, data.pluginPath) : data.pluginPath);
+	}
+	paths.push(path.join(basePath, 'plugin'));
+	if (projectPath) {
+		paths.push(projectPath);
+	}
+
+	var config = {};
+	Object.keys(data).forEach(function(k) {
+		if (k != 'pluginId' && k != 'pluginPath') {
+			config[k] = data[k];
+		}
+	});
+
+	var definitions = null, resolved = null;
+	for (var i = 0; i < paths.length; i++) {
+		var pluginPath = path.join(paths[i], pluginFile);
+		if (failedPlugins[pluginPath]) {
+			continue;
+		}
+
+		if (!(pluginPath in loadedPlugins)) {
+			try {
+				evalFile(pluginPath);
+			} catch (e) {
+				failedPlugins[pluginPath] = true;
+				continue;
+			}
+			loadedPlugins[pluginPath] = loadDefinitions(pluginPath);
+		}
+
+		definitions = loadedPlugins[pluginPath];
+		resolved = pluginPath;
+		break;
+	}
+
+	return {id: data.pluginId, path: resolved, config: config, definitions: definitions};
+}
+
+/**
+ * Creates view-like object from view snapshot, sent by Python side
+ */
+function reviveView(v) {
+	if (!v || !v.__view__) {
+		return v;
+	}
+
+	var sel = {
+		begin: function() {return Math.min(v.sel[0], v.sel[1]);},
+		end: function() {return Math.max(v.sel[0], v.sel[1]);},
+		empty: function() {return v.sel[0] == v.sel[1];}
+	};
+
+	return {
+		fileName: v.fileName,
+		text: v.text || '',
+		sel: function() {return [sel];},
+		is_dirty: function() {return !!v.dirty;}
+	};
+}
+
+var sandbox = vm.createContext({
+	log: log,
+	loadPlugin: loadPlugin,
+	forgetFailedPlugins: function() {
+		failedPlugins = {};
+	},
+	sublimeReadFile: readFile,
+	sublimeGetFileNameFromView: function(view) {
+		return view.fileName;
+	},
+	sublimeViewContents: function(view) {
+		return view.text;
+	},
+	heapStatistics: function() {
+		return v8.getHeapStatistics();
+	},
+	memoryUsage: function() {
+		return process.memoryUsage();
+	},
+	reportBusyFile: function(projectId, fileName) {
+		// if this process is killed during inference,
+		// Python side knows which file caused it
+		send({method: '$/busy', params: fileName ? [projectId, fileName] : null});
+	}
+});
+
+function evalFile(filePath) {
+	vm.runInContext(fs.readFileSync(filePath, 'utf8'), sandbox, {filename: filePath});
+}
+
+function run(message) {
+	var fn = sandbox[message.method];
+	if (typeof fn != 'function') {
+		return send({id: message.id, error: {code: -32601, message: 'No such method: ' + message.method}});
+	}
+
+	if (message.notifyStart) {
+		// lets Python side limit time of request execution only
+		send({method: '$/started', params: [message.id]});
+	}
+
+	try {
+		var result = fn.apply(null, (message.params || []).map(reviveView));
+		send({id: message.id, result: result === undefined ? null : result});
+	} catch (e) {
+		send({id: message.id, error: {code: -32000, message: String(e && e.stack || e)}});
+	}
+}
+
+function drain() {
+	scheduled = false;
+	var message = queue.shift();
+	if (message) {
+		if (message.id in cancelled) {
+			delete cancelled[message.id];
+			send({id: message.id, error: {code: -32800, message: 'Request cancelled'}});
+		} else {
+			run(message);
+		}
+	}
+
+	if (queue.length) {
+		schedule();
+	}
+}
+
+function schedule() {
+	// handle one request per event loop turn so cancellation
+	// notifications are read between requests
+	if (!scheduled) {
+		scheduled = true;
+		setImmediate(drain);
+	}
+}
+
+function dispatch(line) {
+	if (!line.trim()) {
+		return;
+	}
+
+	var message;
+	try {
+		message = JSON.parse(line);
+	} catch (e) {
+		return log('Invalid message: ' + line);
+	}
+
+	if (message.method == '$/cancel') {
+		// finished or running request can't be cancelled
+		var id = message.params.id;
+		if (queue.some(function(m) { return m.id === id; })) {
+			cancelled[id] = true;
+		}
+	} else {
+		queue.push(message);
+		schedule();
+	}
+}
+
+process.argv.slice(2).forEach(function(f) {
+	evalFile(path.join(basePath, f));
+});
+
+readline.createInterface({input: process.stdin, terminal: false})
+	.on('line', dispatch)
+	.on('close', function() {
+		process.exit(0);
+	});
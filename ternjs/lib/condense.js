@@ -41,9 +41,20 @@
     runPass(state.passes.postCondense, state);
 
     simplify(state.output, state.options.sortOutput);
+    dropPrimitiveDefines(state.output);
     return state.output;
   };
 
+  // Spans of primitive values (such as function arguments) end up in
+  // `!define` as annotations that def.js can't load as types, drop them
+  function dropPrimitiveDefines(output) {
+    var defs = output["!define"];
+    if (defs) for (var name in defs) {
+      var spec = defs[name], tp = typeof spec == "object" && spec["!type"];
+      if (tp && !/^fn\(|^\[/.test(tp)) delete defs[name];
+    }
+  }
+
   function State(origins, name, options) {
     this.origins = origins;
     this.cx = infer.cx();
@@ -71,8 +82,11 @@
     if (!srv || !node.originNode || !(file = srv.findFile(node.origin))) return null;
     var start = node.originNode.start, end = node.originNode.end;
     var pStart = file.asLineChar(start), pEnd = file.asLineChar(end);
-    return start + "[" + pStart.line + ":" + pStart.ch + "]-" +
+    var span = start + "[" + pStart.line + ":" + pStart.ch + "]-" +
       end + "[" + pEnd.line + ":" + pEnd.ch + "]";
+    // When condensing several files, prefix span with its file name
+    // so it can be resolved back to that file
+    return this.options.spanOrigins ? node.origin + "@" + span : span;
   };
 
   function pathLen(path) {
@@ -1142,18 +1142,25 @@
 
   // PURGING
 
+  // Returns number of purged types, properties and constraints
   exports.purgeTypes = function(origins, start, end) {
-    var test = makePredicate(origins, start, end);
+    var match = makePredicate(origins, start, end), purged = 0;
+    var test = function(type, node) {
+      var found = match(type, node);
+      if (found) ++purged;
+      return found;
+    };
     ++cx.purgeGen;
     cx.topScope.purge(test);
     for (var prop in cx.props) {
       var list = cx.props[prop];
       for (var i = 0; i < list.length; ++i) {
         var obj = list[i], av = obj.props[prop];
-        if (!av || test(av, av.originNode)) list.splice(i--, 1);
+        if (!av || match(av, av.originNode)) list.splice(i--, 1);
       }
       if (!list.length) delete cx.props[prop];
     }
+    return purged;
   };
 
   function makePredicate(origins, start, end) {
@@ -63,15 +63,49 @@
 
   exports.defineQueryType = function(name, desc) { queryTypes[name] = desc; };
 
+  // Phase timings, in milliseconds, and counters of work done by
+  // server since `resetTiming()`. Time spent fetching and parsing
+  // files that are required during inference is not counted as `infer`
+  function Timing() {
+    this.fetch = this.parse = this.infer = this.purge = this.query = 0;
+    this.requests = this.filesFetched = this.filesParsed = this.filesAnalyzed = 0;
+    this.astNodes = this.typesPurged = 0;
+  }
+  exports.Timing = Timing;
+
+  function countNodes(ast) {
+    var count = 0, base = walk.base;
+    (function c(node, st, override) {
+      if (!override) ++count;
+      base[override || node.type](node, st, c);
+    })(ast);
+    return count;
+  }
+
   function File(name) {
     this.name = name;
     this.scope = this.text = this.ast = this.lineOffsets = null;
+    this.version = 0;
   }
   File.prototype.asLineChar = function(pos) { return asLineChar(this, pos); };
 
   function updateText(file, text, srv) {
+    srv.signal("busy", file.name);
     file.text = text;
-    file.ast = infer.parse(text, srv.passes, {directSourceFile: file});
+    ++file.version;
+    ++srv.generation;
+    // `parseFile` option lets host reuse syntax trees
+    var parseFile = srv.options.parseFile, timing = srv.timing, start = +new Date;
+    try {
+      file.ast = parseFile ? parseFile(file.name, text, srv) : infer.parse(text, srv.passes, {directSourceFile: file});
+    } finally {
+      // back to file that is analyzed, if any
+      srv.signal("busy", srv.analyzing);
+    }
+    // reused trees keep their node count
+    timing.astNodes += file.ast.nodeCount || (file.ast.nodeCount = countNodes(file.ast));
+    timing.parse += +new Date - start;
+    ++timing.filesParsed;
     file.lineOffsets = null;
   }
 
@@ -83,6 +117,14 @@
 
     this.handlers = Object.create(null);
     this.files = [];
+    // incremented on every change of inference state
+    this.generation = 0;
+    // module graph: files loaded while analyzing a file are its
+    // imports, the file is their dependent
+    this.imports = Object.create(null);
+    this.dependents = Object.create(null);
+    this.analyzing = null;
+    this.timing = new Timing();
     this.uses = 0;
     this.pending = 0;
     this.asyncError = null;
@@ -106,11 +148,37 @@
       for (var i = 0, f; i < this.files.length; ++i) if ((f = this.files[i]).name == name) {
         clearFile(this, f);
         this.files.splice(i--, 1);
+        ++this.generation;
+        invalidateDependents(this, [name]);
         return;
       }
     },
+    // Removes all files whose names are keys of given object, purging
+    // types of these files only. Unlike `delFile()`, takes a single
+    // pass over file list
+    delFiles: function(names) {
+      var kept = [];
+      for (var i = 0; i < this.files.length; ++i) {
+        var f = this.files[i];
+        if (names.hasOwnProperty(f.name)) clearFile(this, f);
+        else kept.push(f);
+      }
+      if (kept.length != this.files.length) ++this.generation;
+      this.files = kept;
+      var removed = [];
+      for (var name in names) if (names.hasOwnProperty(name)) removed.push(name);
+      invalidateDependents(this, removed);
+      // dependents are analyzed again and register their imports anew
+      for (var i = 0; i < removed.length; ++i) {
+        forgetImports(this, removed[i]);
+        delete this.dependents[removed[i]];
+      }
+    },
     reset: function() {
       this.signal("reset");
+      ++this.generation;
+      this.imports = Object.create(null);
+      this.dependents = Object.create(null);
       this.cx = new infer.Context(this.defs, this);
       this.uses = 0;
       for (var i = 0; i < this.files.length; ++i) {
@@ -137,6 +205,23 @@
       return findFile(this.files, name);
     },
 
+    resetTiming: function() {
+      return this.timing = new Timing();
+    },
+
+    // Analyzes files that are not analyzed yet until optional
+    // `deadline` passes. Returns number of files left
+    analyzePending: function(deadline) {
+      var left = 0;
+      for (var i = 0; i < this.files.length; ++i) {
+        var file = this.files[i];
+        if (file.scope != null) continue;
+        if (file.text == null || (deadline && +new Date > deadline)) ++left;
+        else analyzeFile(this, file);
+      }
+      return left;
+    },
+
     flush: function(c) {
       var cx = this.cx;
       analyzeAll(this, function(err) {
@@ -159,6 +244,7 @@
       return c("No query type '" + doc.query.type + "' defined");
 
     var query = doc.query;
+    ++srv.timing.requests;
     // Respond as soon as possible when this just uploads files
     if (!query) c(null, {});
 
@@ -180,41 +266,115 @@
       if (!/^#/.test(query.file)) ensureFile(srv, query.file);
     }
 
+    // With `doc.timeout`, files that are not analyzed when it expires
+    // are hidden from query, which runs on partial project state
+    var deadline = doc.timeout ? +new Date + doc.timeout : null;
+    var keep = queryType.takesFile && query.file, m;
+    if (keep && (m = keep.match(/^#(\d+)$/)) && files[+m[1]]) keep = files[+m[1]].name;
     analyzeAll(srv, function(err) {
       if (err) return c(err);
+      var all = srv.files;
+      if (srv.skipped) {
+        srv.files = [];
+        for (var i = 0; i < all.length; ++i)
+          if (all[i].scope) srv.files.push(all[i]);
+      }
+      try {
+        runQuery();
+      } finally {
+        srv.files = all;
+      }
+    }, deadline, keep);
+
+    function runQuery() {
       var file = queryType.takesFile && resolveFile(srv, files, query.file);
       if (queryType.fullFile && file.type == "part")
         return c("Can't run a " + query.type + " query on a file fragment");
 
       infer.withContext(srv.cx, function() {
-        var result;
+        var result, start = +new Date;
         try {
           result = queryType.run(srv, query, file);
+          srv.timing.query += +new Date - start;
         } catch (e) {
           if (srv.options.debug && e.name != "TernError") console.error(e.stack);
           return c(e);
         }
         c(null, result);
       });
-    });
+    }
   }
 
   function analyzeFile(srv, file) {
-    infer.withContext(srv.cx, function() {
-      file.scope = srv.cx.topScope;
-      srv.signal("beforeLoad", file);
-      infer.markVariablesDefinedBy(file.scope, file.name);
-      infer.analyze(file.ast, file.name, file.scope, srv.passes);
-      infer.purgeMarkedVariables(file.scope);
-      srv.signal("afterLoad", file);
-    });
+    srv.signal("busy", file.name);
+    forgetImports(srv, file.name);
+    var prev = srv.analyzing, timing = srv.timing;
+    var start = +new Date, nested = timing.fetch + timing.parse;
+    srv.analyzing = file.name;
+    try {
+      infer.withContext(srv.cx, function() {
+        file.scope = srv.cx.topScope;
+        srv.signal("beforeLoad", file);
+        infer.markVariablesDefinedBy(file.scope, file.name);
+        infer.analyze(file.ast, file.name, file.scope, srv.passes);
+        infer.purgeMarkedVariables(file.scope);
+        srv.signal("afterLoad", file);
+      });
+    } finally {
+      srv.analyzing = prev;
+      srv.signal("busy", prev);
+      timing.infer += +new Date - start - (timing.fetch + timing.parse - nested);
+      ++timing.filesAnalyzed;
+    }
     return file;
   }
 
+  function addImport(srv, name, dep) {
+    (srv.imports[name] || (srv.imports[name] = Object.create(null)))[dep] = true;
+    (srv.dependents[dep] || (srv.dependents[dep] = Object.create(null)))[name] = true;
+  }
+
+  function forgetImports(srv, name) {
+    var imports = srv.imports[name];
+    if (!imports) return;
+    for (var dep in imports) if (srv.dependents[dep]) delete srv.dependents[dep][name];
+    delete srv.imports[name];
+  }
+
+  // Purges types of all files that depend, directly or not, on given
+  // files so they are analyzed again with the next request. Signals
+  // "invalidate" with names of changed files and number of dependents
+  function invalidateDependents(srv, names) {
+    var seen = Object.create(null), queue = names.slice(0), count = 0;
+    for (var i = 0; i < names.length; ++i) seen[names[i]] = true;
+    while (queue.length) {
+      var dependents = srv.dependents[queue.shift()];
+      for (var name in dependents) {
+        if (seen[name]) continue;
+        seen[name] = true;
+        queue.push(name);
+        var file = findFile(srv.files, name);
+        if (file && file.scope) {
+          clearFile(srv, file);
+          ++count;
+        }
+      }
+    }
+    if (count) ++srv.generation;
+    srv.signal("invalidate", names, count);
+    return count;
+  }
+
   function ensureFile(srv, name, text) {
+    if (srv.analyzing && srv.analyzing != name) addImport(srv, srv.analyzing, name);
+
     var known = findFile(srv.files, name);
     if (known) {
-      if (text) clearFile(srv, known, text);
+      // unchanged text doesn't invalidate inferred types
+      if (text && text != known.text) {
+        clearFile(srv, known, text);
+        invalidateDependents(srv, [name]);
+      }
       return;
     }
 
@@ -229,19 +389,31 @@
         srv.finishAsyncAction(err);
       });
     } else {
-      updateText(file, srv.options.getFile(name) || "", srv);
+      updateText(file, fetchFile(srv, name), srv);
     }
   }
 
+  function fetchFile(srv, name) {
+    var start = +new Date;
+    var text = srv.options.getFile(name) || "";
+    srv.timing.fetch += +new Date - start;
+    ++srv.timing.filesFetched;
+    return text;
+  }
+
   function clearFile(srv, file, newText) {
     if (file.scope) {
+      var start = +new Date;
       infer.withContext(srv.cx, function() {
         // FIXME try to batch purges into a single pass (each call needs
         // to traverse the whole graph)
-        infer.purgeTypes(file.name);
+        srv.timing.typesPurged += infer.purgeTypes(file.name);
         infer.markVariablesDefinedBy(file.scope, file.name);
         infer.purgeMarkedVariables(file.scope);
+        // lets plugins purge types they keep outside of scopes
+        srv.signal("purge", file.name);
       });
+      srv.timing.purge += +new Date - start;
       file.scope = null;
     }
     if (newText != null) updateText(file, newText, srv);
@@ -261,7 +433,7 @@
         });
       } else {
         try {
-          updateText(file, srv.options.getFile(file.name) || "", srv);
+          updateText(file, fetchFile(srv, file.name), srv);
         } catch (e) { return c(e); }
       }
     }
@@ -278,17 +450,24 @@
     var timeout = setTimeout(done, srv.options.fetchTimeout);
   }
 
-  function analyzeAll(srv, c) {
+  // Files that are not analyzed yet when optional `deadline` passes
+  // are skipped, except the `keep` one. Number of skipped files
+  // is stored in `srv.skipped`
+  function analyzeAll(srv, c, deadline, keep) {
     if (srv.pending) return waitOnFetch(srv, c);
 
     var e = srv.fetchError;
     if (e) { srv.fetchError = null; return c(e); }
 
     var done = true;
+    srv.skipped = 0;
     for (var i = 0; i < srv.files.length; ++i) {
       var file = srv.files[i];
       if (file.text == null) done = false;
-      else if (file.scope == null) analyzeFile(srv, file);
+      else if (file.scope == null) {
+        if (deadline && file.name != keep && +new Date > deadline) ++srv.skipped;
+        else analyzeFile(srv, file);
+      }
     }
     if (done) c();
     else waitOnFetch(srv, c);
@@ -349,7 +528,7 @@
     var pos = foundPos == null ? Math.max(0, realFile.text.lastIndexOf("\n", offset)) : foundPos;
 
     infer.withContext(srv.cx, function() {
-      infer.purgeTypes(file.name, pos, pos + file.text.length);
+      srv.timing.typesPurged += infer.purgeTypes(file.name, pos, pos + file.text.length);
 
       var text = file.text, m;
       if (m = text.match(/(?:"([^"]*)"|([\w$]+))\s*:\s*function\b/)) {
@@ -661,9 +840,11 @@
   var storeSpan = exports.storeSpan = function(srv, query, span, target) {
     target.origin = span.origin;
     if (span.span) {
-      var m = /^(\d+)\[(\d+):(\d+)\]-(\d+)\[(\d+):(\d+)\]$/.exec(span.span);
-      target.start = query.lineCharPositions ? {line: Number(m[2]), ch: Number(m[3])} : Number(m[1]);
-      target.end = query.lineCharPositions ? {line: Number(m[5]), ch: Number(m[6])} : Number(m[4]);
+      var m = /^(?:(.*)@)?(\d+)\[(\d+):(\d+)\]-(\d+)\[(\d+):(\d+)\]$/.exec(span.span);
+      // span, condensed with `spanOrigins` option, refers to its own file
+      if (m[1]) target.origin = m[1];
+      target.start = query.lineCharPositions ? {line: Number(m[3]), ch: Number(m[4])} : Number(m[2]);
+      target.end = query.lineCharPositions ? {line: Number(m[6]), ch: Number(m[7])} : Number(m[5]);
     } else {
       var file = findFile(srv.files, span.origin);
       target.start = outputPos(query, file, span.node.start);
@@ -695,8 +876,8 @@
       result.contextOffset = span.node.start - cxStart;
       result.context = spanFile.text.slice(cxStart, cxStart + 50);
     } else if (span) { // external
-      result.file = span.origin;
       storeSpan(srv, query, span, result);
+      result.file = result.origin;
     }
     return clean(result);
   }
@@ -0,0 +1,86 @@
+"""
+Lifecycle of project servers.
+
+Project server is started when first file of project is opened, but
+nothing stops it when project window is closed. This module tracks
+which views reference every project: when last view of project is
+closed, project is scheduled for release after a grace period, so
+closing and re-opening a file or switching projects back and forth
+doesn't restart servers
+"""
+import time
+
+class ProjectLifecycle():
+	"""
+	@param grace: Time, in seconds, to keep server of project
+	without views. Negative value disables releasing
+	"""
+	def __init__(self, grace=300):
+		self.grace = grace
+		self.views = {}
+		self.pending = {}
+		# views that belong to no project
+		self.orphans = set()
+
+	def attach(self, project_id, view_id):
+		"Marks given project as referenced by given view"
+		self.views.setdefault(project_id, set()).add(view_id)
+		self.pending.pop(project_id, None)
+
+	def mark_orphan(self, view_id):
+		"Marks given view as one that doesn't belong to any project"
+		self.orphans.add(view_id)
+
+	def is_orphan(self, view_id):
+		return view_id in self.orphans
+
+	def has_view(self, view_id):
+		"Check if given view is known, with or without project"
+		if view_id in self.orphans:
+			return True
+		for views in self.views.values():
+			if view_id in views:
+				return True
+		return False
+
+	def detach(self, view_id):
+		"""
+		Removes given view from every project that references it.
+		Returns list of projects scheduled for release
+		"""
+		self.orphans.discard(view_id)
+		released = []
+		for project_id, views in list(self.views.items()):
+			if view_id not in views:
+				continue
+
+			views.discard(view_id)
+			if not views:
+				del self.views[project_id]
+				if self.grace >= 0:
+					self.pending[project_id] = time.time() + self.grace
+					released.append(project_id)
+
+		return released
+
+	def expired(self, now=None):
+		"Returns projects which grace period is over and stops tracking them"
+		now = now or time.time()
+		result = [k for k, v in self.pending.items() if v <= now]
+		for project_id in result:
+			del self.pending[project_id]
+		return result
+
+	def postpone(self, project_id):
+		"Schedules release of given project after another grace period"
+		if project_id not in self.views and self.grace >= 0:
+			self.pending[project_id] = time.time() + self.grace
+
+	def forget(self, project_id):
+		self.views.pop(project_id, None)
+		self.pending.pop(project_id, None)
+
+	def clear(self):
+		self.views.clear()
+		self.pending.clear()
+		self.orphans.clear()
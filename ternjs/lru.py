@@ -0,0 +1,94 @@
+"""
+Least-recently-used cache bounded either by number of items
+or by total size of items
+"""
+import threading
+
+class LRUCache():
+	"""
+	@param max_size: Max total size of cached items
+	@param sizeof: Function that returns size of cached value.
+	By default, every item has size of 1
+	"""
+	def __init__(self, max_size=1000, sizeof=None):
+		self.max_size = max_size
+		self.sizeof = sizeof or (lambda v: 1)
+		self.size = 0
+		self.hits = 0
+		self.misses = 0
+		self._lock = threading.RLock()
+		self.clear()
+
+	def clear(self):
+		with self._lock:
+			# circular doubly linked list of [prev, next, key, value, size],
+			# most recently used item is right before root
+			self._root = root = []
+			root[:] = [root, root, None, None, 0]
+			self._map = {}
+			self.size = 0
+
+	def __len__(self):
+		return len(self._map)
+
+	def __contains__(self, key):
+		return key in self._map
+
+	def keys(self):
+		return list(self._map.keys())
+
+	def _unlink(self, link):
+		prev, nxt = link[0], link[1]
+		prev[1] = nxt
+		nxt[0] = prev
+
+	def _append(self, link):
+		root = self._root
+		last = root[0]
+		last[1] = root[0] = link
+		link[0] = last
+		link[1] = root
+
+	def get(self, key, default=None):
+		"Returns cached value and marks it as recently used"
+		with self._lock:
+			link = self._map.get(key)
+			if link is None:
+				self.misses += 1
+				return default
+
+			self.hits += 1
+			self._unlink(link)
+			self._append(link)
+			return link[3]
+
+	def peek(self, key, default=None):
+		"Returns cached value without affecting its usage order"
+		link = self._map.get(key)
+		return default if link is None else link[3]
+
+	def put(self, key, value):
+		with self._lock:
+			self.pop(key)
+			size = self.sizeof(value)
+			if size > self.max_size:
+				return
+
+			link = [None, None, key, value, size]
+			self._append(link)
+			self._map[key] = link
+			self.size += size
+
+			while self.size > self.max_size:
+				oldest = self._root[1]
+				self.pop(oldest[2])
+
+	def pop(self, key, default=None):
+		with self._lock:
+			link = self._map.pop(key, None)
+			if link is None:
+				return default
+
+			self._unlink(link)
+			self.size -= link[4]
+			return link[3]
@@ -0,0 +1,127 @@
+"""
+Memory report of TernJS plugin, displayed by `TernJS: Memory Report`
+command: engine heap, estimates of every project server and Python
+allocations of plugin, traced with `tracemalloc` when it's available
+"""
+import os
+import os.path
+import json
+import time
+import codecs
+
+try:
+	import tracemalloc
+except ImportError:
+	# Python 3.3 of Sublime Text 3 and Python 2.6 of Sublime Text 2
+	tracemalloc = None
+
+PLUGIN_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def start_tracing(frames=1):
+	"Starts tracing Python allocations, returns `False` if it's not supported"
+	if not tracemalloc:
+		return False
+	if not tracemalloc.is_tracing():
+		tracemalloc.start(frames)
+	return True
+
+def is_tracing():
+	return bool(tracemalloc) and tracemalloc.is_tracing()
+
+def plugin_allocations(limit=10):
+	"""
+	Returns list of `(file:line, size, count)` tuples of top Python
+	allocations made by plugin code, or `None` if they're not traced
+	"""
+	if not is_tracing():
+		return None
+
+	snapshot = tracemalloc.take_snapshot().filter_traces([
+		tracemalloc.Filter(True, os.path.join(PLUGIN_PATH, '*'))
+	])
+
+	result = []
+	for stat in snapshot.statistics('lineno')[:limit]:
+		frame = stat.traceback[0]
+		result.append(('%s:%d' % (os.path.relpath(frame.filename, PLUGIN_PATH), frame.lineno), stat.size, stat.count))
+	return result
+
+def text_size(value):
+	"Returns total length of strings in given value"
+	if isinstance(value, dict):
+		return sum(text_size(k) + text_size(v) for k, v in value.items())
+	if isinstance(value, (list, tuple, set)):
+		return sum(text_size(v) for v in value)
+	if hasattr(value, 'encode'):
+		return len(value)
+	return 0
+
+def format_size(size):
+	if size is None:
+		return 'n/a'
+	for unit in ['B', 'KB', 'MB']:
+		if size < 1024:
+			return '%.1f %s' % (size, unit)
+		size /= 1024.0
+	return '%.1f GB' % size
+
+def heap_lines(heap):
+	if not heap:
+		return ['Heap statistics are not available for this engine']
+	# V8 reports some counters along with sizes
+	return ['%-28s %s' % (k, heap[k] if k.startswith(('number_', 'does_')) else format_size(heap[k])) for k in sorted(heap)]
+
+def server_lines(servers):
+	lines = []
+	for server_id in sorted(servers):
+		s = servers[server_id]
+		lines.append(server_id)
+		lines.append('    %d files (%d analyzed), %s of sources, %d objects, %d values, %d symbols' % (s['files'],
+			s['analyzed'], format_size(s['bytes']), s['types'], s['avals'], s['symbols']))
+	return lines
+
+def python_lines(objects, limit=10):
+	"""
+	Returns report lines for given `(name, value)` list of plugin
+	data and top allocations of plugin code
+	"""
+	lines = ['%-20s %s of strings' % (name, format_size(text_size(value))) for name, value in objects]
+
+	allocations = plugin_allocations(limit)
+	lines.append('')
+	if allocations is None:
+		lines.append('Allocations are not traced: enable "memory_tracing" setting (requires Python 3.4+)')
+	else:
+		lines.append('Top %d allocations of plugin code:' % limit)
+		for where, size, count in allocations:
+			lines.append('%10s %7d blocks  %s' % (format_size(size), count, where))
+	return lines
+
+class MemorySampler():
+	"""
+	Appends memory samples as JSON lines to given log file,
+	for tracking leaks during long sessions
+
+	@param log_path: Path to log file
+	"""
+	def __init__(self, log_path):
+		self.log_path = log_path
+
+	def sample(self, heap, servers):
+		record = {
+			'time': time.time(),
+			'heap': (heap or {}).get('used_heap_size'),
+			'servers': dict((k, {'files': v['files'], 'bytes': v['bytes']}) for k, v in servers.items())
+		}
+
+		if is_tracing():
+			record['python'] = tracemalloc.get_traced_memory()[0]
+
+		log_dir = os.path.dirname(self.log_path)
+		if not os.path.exists(log_dir):
+			os.makedirs(log_dir)
+
+		with codecs.open(self.log_path, 'a', 'utf-8') as f:
+			f.write(json.dumps(record) + '\n')
+
+		return record
@@ -0,0 +1,186 @@
+"""
+Persisted condensed project state, used for warm start of TernJS servers.
+
+Before server is stopped, types inferred for its project are condensed
+into a defs object and cached on disk, together with content hashes of
+condensed files. When server is started again, cached defs are loaded
+as extra library and only files with changed contents are analyzed
+"""
+import os
+import os.path
+import json
+import codecs
+import hashlib
+
+CACHE_VERSION = 1
+
+# Entries of changed files are dropped from cached defs when they are
+# loaded, but types these files contributed to other entries are kept
+# until state is built from scratch. When ratio of such files exceeds
+# this value, cached state is discarded
+MAX_PATCHED_RATIO = 0.2
+
+def file_hash(file_path):
+	"Returns hash of given file contents"
+	with open(file_path, 'rb') as f:
+		return hashlib.sha1(f.read()).hexdigest()
+
+def project_file_path(project, f):
+	if not os.path.isabs(f) and project.get('dir'):
+		return os.path.join(project['dir'], f)
+	return f
+
+def prune_defs(defs, files):
+	"""
+	Removes entries of condensed defs which spans refer to given files,
+	so types of changed files don't outlive their changes
+	"""
+	prefixes = tuple('%s@' % f for f in files)
+
+	def prune(obj):
+		for k, v in list(obj.items()):
+			if k == '!define' or not isinstance(v, dict):
+				continue
+			if v.get('!span', '').startswith(prefixes):
+				del obj[k]
+			else:
+				prune(v)
+
+	if prefixes:
+		prune(defs)
+	return defs
+
+class StateStore():
+	"""
+	@param cache_dir: Folder where project states are stored
+	"""
+	def __init__(self, cache_dir, logger=None):
+		self.cache_dir = cache_dir
+		self.logger = logger
+		# warm start info of running servers
+		self._warm = {}
+
+	def log(self, message):
+		if self.logger:
+			self.logger(message)
+
+	def defs_name(self, project_id):
+		"Returns name of condensed defs for given project"
+		return 'warm:%s' % project_id
+
+	def _cache_file(self, project_id):
+		key = hashlib.sha1(project_id.encode('utf-8')).hexdigest()
+		return os.path.join(self.cache_dir, '%s.json' % key)
+
+	def _load(self, project_id):
+		try:
+			with codecs.open(self._cache_file(project_id), 'r', 'utf-8') as f:
+				data = json.load(f)
+		except (IOError, OSError, ValueError):
+			return None
+
+		if data.get('version') != CACHE_VERSION or data.get('project') != project_id:
+			return None
+
+		return data
+
+	def _file_info(self, project, f, known=None):
+		"""
+		Returns hash, mtime and size of given project file.
+		Hash is not recalculated if file mtime and size are
+		the same as in `known` info
+		"""
+		file_path = project_file_path(project, f)
+		try:
+			st = os.stat(file_path)
+		except OSError:
+			return None
+
+		if known and known.get('mtime') == st.st_mtime and known.get('size') == st.st_size:
+			return known
+
+		return {'hash': file_hash(file_path), 'mtime': st.st_mtime, 'size': st.st_size}
+
+	def warm_start(self, project):
+		"""
+		Returns tuple of cached defs (as JSON string) for given project
+		and set of project files described by them. Returns `(None, set())`
+		if there's no usable cached state
+		"""
+		project_id = project['id']
+		if project_id in self._warm:
+			return self._warm[project_id]
+
+		result = (None, set())
+		data = self._load(project_id)
+		if data:
+			files = set(project.get('files', []))
+			warm_files = set()
+			for f, info in data['files'].items():
+				if f in files:
+					actual = self._file_info(project, f, info)
+					if actual and actual['hash'] == info['hash']:
+						warm_files.add(f)
+
+			patched = data.get('patched', 0) + len(files - warm_files)
+			if warm_files and patched <= MAX_PATCHED_RATIO * len(files):
+				defs = prune_defs(data['defs'], set(data['files']) - warm_files)
+				result = (json.dumps(defs), warm_files)
+				self.log('Warm start for %s: %d of %d files are up to date' % (project_id, len(warm_files), len(files)))
+
+		self._warm[project_id] = result
+		return result
+
+	def warm_files(self, project_id):
+		"Returns set of files of running server described by cached defs"
+		return self._warm.get(project_id, (None, set()))[1]
+
+	def save(self, project, data):
+		"""
+		Saves condensed state of given project
+		@param data: Decoded result of `condenseServer()` JS call
+		"""
+		project_id = project['id']
+		defs, warm_files = self._warm.get(project_id, (None, set()))
+		prev = self._load(project_id) if defs else None
+
+		files = {}
+		patched = 0
+		if prev:
+			# condensed defs include previously loaded ones
+			for f in warm_files:
+				if f in prev['files']:
+					files[f] = prev['files'][f]
+			patched = prev.get('patched', 0)
+
+		for f in data['files']:
+			# unsaved buffers are not project files
+			info = self._file_info(project, f)
+			if info:
+				files[f] = info
+				if prev:
+					patched += 1
+
+		if not os.path.exists(self.cache_dir):
+			os.makedirs(self.cache_dir)
+
+		with codecs.open(self._cache_file(project_id), 'w', 'utf-8') as f:
+			f.write(json.dumps({
+				'version': CACHE_VERSION,
+				'project': project_id,
+				'files': files,
+				'patched': patched,
+				'defs': data['defs']
+			}, ensure_ascii=False))
+
+	def forget(self, project_id):
+		"Drops warm start info of stopped server"
+		self._warm.pop(project_id, None)
+
+	def discard(self, project_id):
+		"Removes saved state of given project, e.g. when its libraries were changed"
+		self.forget(project_id)
+		try:
+			os.remove(self._cache_file(project_id))
+		except OSError:
+			pass
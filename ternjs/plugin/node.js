@@ -16,6 +16,25 @@
     return path.replace(/(^|[^\.])\.\//g, "$1");
   }
 
+  // Modules inside project are named as project files, so they
+  // match files analyzed by server
+  function projectPath(server, path) {
+    var dir = server.options.projectDir;
+    if (!dir) return path;
+    dir = dir.replace(/\\/g, "/").replace(/\/?$/, "/");
+    return path.indexOf(dir) == 0 ? path.slice(dir.length) : path;
+  }
+
+  // Module name without extension is resolved to project file
+  // it refers to, so the file is not analyzed twice
+  function projectModule(server, name) {
+    if (/\.js(on)?$/.test(name)) return name;
+    var candidates = [name + ".js", name + "/index.js"];
+    for (var i = 0; i < candidates.length; ++i)
+      if (server.findFile(candidates[i])) return candidates[i];
+    return name;
+  }
+
   function getModule(data, name) {
     return data.modules[name] || (data.modules[name] = new infer.AVal);
   }
@@ -81,16 +100,24 @@
     var relative = /^\.{0,2}\//.test(name);
     if (relative) {
       if (!data.currentFile) return argNodes[0].required || infer.ANull;
-      name = resolvePath(data.currentFile, name);
+      name = projectModule(server, projectPath(server, resolvePath(data.currentFile, name)));
     }
 
-    if (name in data.modules) return data.modules[name];
+    if (name in data.modules) {
+      // lets server register dependency of current file
+      if (relative) server.addFile(name);
+      return data.modules[name];
+    }
 
     var result;
     if (data.options.modules && data.options.modules.hasOwnProperty(name)) {
       var scope = buildWrappingScope(cx.topScope, name);
       infer.def.load(data.options.modules[name], scope);
       result = data.modules[name] = scope.exports;
+    } else if (relative && server.findFile(name)) {
+      // project file, analyzed by server under the same name
+      server.addFile(name);
+      result = getModule(data, name);
     } else {
       result = resolveModule(server, name, data.currentFile);
     }
@@ -136,6 +163,13 @@
       this._node.modules = Object.create(null);
     });
 
+    // modules are not reachable from top scope, so types of purged
+    // file have to be removed from them explicitly
+    server.on("purge", function(origin) {
+      var test = function(type) { return type.origin == origin; };
+      for (var name in this._node.modules) this._node.modules[name].purge(test);
+    });
+
     return {defs: defs,
             passes: {preCondenseReach: preCondenseReach,
                      postLoadDef: postLoadDef}};
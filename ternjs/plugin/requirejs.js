@@ -72,10 +72,9 @@
       name = resolveName(name, data);
     name = flattenPath(name);
     var known = data.interfaces[name];
-    if (!known) {
-      known = data.interfaces[name] = new infer.AVal;
-      data.server.addFile(name);
-    }
+    if (!known) known = data.interfaces[name] = new infer.AVal;
+    // registers dependency of current file even if module is known
+    data.server.addFile(name);
     return known;
   }
 
@@ -174,6 +173,13 @@
       this._requireJS.interfaces = Object.create(null);
       this._requireJS.require = null;
     });
+    // interfaces are not reachable from top scope, so types of
+    // purged file have to be removed from them explicitly
+    server.on("purge", function(origin) {
+      var test = function(type) { return type.origin == origin; };
+      var interfaces = this._requireJS.interfaces;
+      for (var name in interfaces) interfaces[name].purge(test);
+    });
     return {defs: defs};
   });
 
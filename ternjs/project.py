@@ -14,6 +14,12 @@ is_python3 = sys.version_info[0] > 2
 
 _cache = None
 
+# Keys of TernJS config that require restart of project server
+SERVER_KEYS = ['libs', 'plugins', 'dir']
+
+# Keys of TernJS config that affect list of project files
+FILE_KEYS = ['include', 'exclude']
+
 try:
 	isinstance("", basestring)
 	def isstr(s):
@@ -96,6 +102,21 @@ def resolve_project_file_path(f, project_dir):
 	return f
 		
 
+def project_id_for_view(view, lookup=None):
+	"""
+	Returns project file of given view, if any
+	@param lookup: Hint with located projects to speed-up look-ups
+	"""
+	wnd = view.window()
+	if wnd and hasattr(wnd, 'project_file_name') and wnd.project_file_name():
+		# ST3 API: get project file of view window
+		return wnd.project_file_name()
+
+	f = view.file_name()
+	if lookup is None:
+		lookup = [p['id'] for p in _cache or []]
+	return f and locate_project(f, lookup) or None
+
 def projects_from_opened_files(window=None):
 	"Returns list of projects for all opened files in editor"
 	if window is None:
@@ -106,14 +127,7 @@ def projects_from_opened_files(window=None):
 	result = set()
 	for wnd in windows:
 		for view in wnd.views():
-			proj = None
-			if hasattr(view, 'project_file_name'):
-				# ST3 API: get project file from opened view
-				proj = view.project_file_name()
-			else:
-				f = view.file_name()
-				if f:
-					proj = locate_project(f, result)
+			proj = project_id_for_view(view, result)
 			if proj:
 				result.add(proj)
 
@@ -141,6 +155,25 @@ def info(project_id):
 		'files': get_ternjs_files(project_id, config)
 	}
 
+def reload_info(project_id):
+	"""
+	Re-reads config of given cached project. Returns tuple of old
+	and new project info, old info is `None` if project is not cached
+	"""
+	new_info = info(project_id)
+	old_info = None
+	for i, p in enumerate(_cache or []):
+		if p['id'] == project_id:
+			old_info = p
+			_cache[i] = new_info
+
+	return old_info, new_info
+
+def config_changes(old_config, new_config):
+	"Returns list of keys that differ in given TernJS configs"
+	keys = set(old_config.keys()) | set(new_config.keys())
+	return sorted([k for k in keys if old_config.get(k) != new_config.get(k)])
+
 def project_for_view(view):
 	"Returns project info for given view"
 	file_name = view.file_name()
@@ -198,9 +231,20 @@ def add_to_cache(project_id):
 	if isinstance(project_id, dict):
 		project_id = project_id.get('id')
 
+	if _cache is None:
+		all_projects()
+
 	if not in_cache(project_id):
 		if not _cache:
 			globals()['_cache'] = []
 
 		globals()['_cache'].append(info(project_id))
 
+def remove_from_cache(project_id):
+	"Removes given project from cache, e.g. when its window is closed"
+	if isinstance(project_id, dict):
+		project_id = project_id.get('id')
+
+	if _cache:
+		globals()['_cache'] = [p for p in _cache if p['id'] != project_id]
+
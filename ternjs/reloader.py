@@ -12,8 +12,22 @@ for mod in sys.modules:
 
 mods_load_order = [
 	'ternjs.tern_plugin',
+	'ternjs.lru',
+	'ternjs.stats',
+	'ternjs.tracing',
+	'ternjs.memory',
+	'ternjs.lifecycle',
+	'ternjs.warmup',
+	'ternjs.vendor',
+	'ternjs.completion',
 	'ternjs.pyv8loader',
 	'ternjs.context',
+	'ternjs.rpc',
+	'ternjs.watchdog',
+	'ternjs.persist',
+	'ternjs.depdefs',
+	'ternjs.filecache',
+	'ternjs.deadline',
 	'ternjs.formic',
 	'ternjs.project'
 ]
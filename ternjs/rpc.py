@@ -0,0 +1,363 @@
+"""
+Out-of-process TernJS engine.
+
+Runs `controller.js` API in a separate worker process (see `js/worker.js`)
+and talks newline-delimited JSON-RPC to it over pipes, so long inference
+does not block plugin host and engine crash does not take editor down
+"""
+import json
+import time
+import threading
+import subprocess
+
+from context import Context, make_path, js_file_reader
+
+WORKER_FILE = make_path('js/worker.js')
+
+class RPCError(Exception):
+	pass
+
+class RPCCancelled(RPCError):
+	pass
+
+class AttrDict(dict):
+	"Dict with attribute access, mimics JS objects returned by PyV8"
+	def __getattr__(self, name):
+		try:
+			return self[name]
+		except KeyError:
+			raise AttributeError(name)
+
+def decode(data):
+	return json.loads(data, object_hook=AttrDict)
+
+class PendingRequest():
+	"A request sent to worker which response is not received yet"
+	def __init__(self, client, request_id, on_start=None):
+		self.client = client
+		self.id = request_id
+		self.on_start = on_start
+		self.result = None
+		self.error = None
+		self._event = threading.Event()
+
+	def resolve(self, result=None, error=None):
+		self.result = result
+		self.error = error
+		self._event.set()
+
+	def done(self):
+		return self._event.is_set()
+
+	def wait(self, timeout=None):
+		"""
+		Waits for request response and returns its result.
+		Raises `RPCError` if request failed or timed out
+		"""
+		self._event.wait(timeout)
+		if not self.done():
+			self.cancel()
+			raise RPCCancelled('Request %s timed out' % self.id)
+
+		if self.error is not None:
+			if self.error.get('code') == -32800:
+				raise RPCCancelled(self.error.get('message'))
+			raise RPCError(self.error.get('message'))
+
+		return self.result
+
+	def cancel(self):
+		"Cancels request, if it is not started by worker yet"
+		if not self.done():
+			self.client.notify('$/cancel', {'id': self.id})
+
+
+class RPCClient():
+	"""
+	JSON-RPC client for TernJS worker process. Requests can be pipelined:
+	any number of them may be sent before responses arrive.
+	Worker is started on first request and automatically restarted
+	if it crashes
+
+	@param args: Command line to start worker
+	@param logger: Function that receives log messages
+	@param on_restart: Callback invoked when crashed worker is restarted
+	@param max_restarts: Max number of restarts per minute
+	"""
+	def __init__(self, args, logger=None, on_restart=None, max_restarts=5):
+		self.args = args
+		self.logger = logger
+		self.on_restart = on_restart
+		self.max_restarts = max_restarts
+		self._proc = None
+		self._pending = {}
+		self._counter = 0
+		self._restarts = []
+		self._lock = threading.Lock()
+		self._started = False
+		# `[project id, file name]` worker is busy with
+		self.busy_file = None
+
+	def log(self, message):
+		if self.logger:
+			self.logger(message)
+
+	def alive(self):
+		return self._proc is not None and self._proc.poll() is None
+
+	def start(self):
+		startupinfo = None
+		if hasattr(subprocess, 'STARTUPINFO'):
+			# do not show console window on Windows
+			startupinfo = subprocess.STARTUPINFO()
+			startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+		self._proc = subprocess.Popen(self.args, stdin=subprocess.PIPE,
+			stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=startupinfo)
+
+		for target, stream in [(self._read_loop, self._proc.stdout), (self._read_stderr, self._proc.stderr)]:
+			t = threading.Thread(target=target, args=(self._proc, stream))
+			t.daemon = True
+			t.start()
+
+		if self._started:
+			self.log('TernJS worker restarted')
+		self._started = True
+
+	def _ensure_started(self):
+		"Starts worker if required, returns `True` if it was restarted"
+		if self.alive():
+			return False
+
+		restarted = self._started
+		if restarted:
+			now = time.time()
+			self._restarts = [t for t in self._restarts if now - t < 60] + [now]
+			if len(self._restarts) > self.max_restarts:
+				raise RPCError('TernJS worker crashed too many times')
+
+		self.start()
+		return restarted
+
+	def _write(self, message):
+		data = (json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8')
+		self._proc.stdin.write(data)
+		self._proc.stdin.flush()
+
+	def request(self, method, params=None, on_start=None):
+		"""
+		Sends request to worker and returns `PendingRequest` instance
+		@param on_start: Function called when worker takes request
+		from its queue and starts running it
+		"""
+		with self._lock:
+			restarted = self._ensure_started()
+			self._counter += 1
+			req = PendingRequest(self, self._counter, on_start)
+			self._pending[req.id] = req
+			message = {'id': req.id, 'method': method, 'params': params or []}
+			if on_start:
+				message['notifyStart'] = True
+			try:
+				self._write(message)
+			except (IOError, OSError) as e:
+				del self._pending[req.id]
+				raise RPCError('Unable to send request to TernJS worker: %s' % e)
+
+		if restarted and self.on_restart:
+			# all servers are lost with crashed worker
+			self.on_restart()
+
+		return req
+
+	def call(self, method, params=None, timeout=None):
+		"Sends request and waits for its result"
+		return self.request(method, params).wait(timeout)
+
+	def notify(self, method, params=None):
+		with self._lock:
+			if self.alive():
+				try:
+					self._write({'method': method, 'params': params})
+				except (IOError, OSError):
+					pass
+
+	def kill(self):
+		"Kills worker process, it is restarted on next request"
+		proc = self._proc
+		if proc and proc.poll() is None:
+			try:
+				proc.kill()
+			except OSError:
+				pass
+
+	def close(self):
+		with self._lock:
+			proc = self._proc
+			self._proc = None
+			self._started = False
+
+		if proc and proc.poll() is None:
+			try:
+				proc.stdin.close()
+				proc.kill()
+			except (IOError, OSError):
+				pass
+
+	def _read_loop(self, proc, stream):
+		for line in iter(stream.readline, b''):
+			try:
+				message = decode(line.decode('utf-8'))
+			except ValueError:
+				self.log('Invalid worker response: %s' % line)
+				continue
+
+			if 'id' in message:
+				with self._lock:
+					req = self._pending.pop(message['id'], None)
+				if req:
+					req.resolve(message.get('result'), message.get('error'))
+			elif message.get('method') == 'log':
+				self.log(message['params'][0])
+			elif message.get('method') == '$/busy':
+				self.busy_file = message['params']
+			elif message.get('method') == '$/started':
+				# worker is busy with files of this request only
+				self.busy_file = None
+				with self._lock:
+					req = self._pending.get(message['params'][0])
+				if req and req.on_start:
+					req.on_start()
+
+		# worker process exited: fail all pending requests,
+		# it will be restarted on next request
+		with self._lock:
+			pending = self._pending
+			self._pending = {}
+		for req in pending.values():
+			req.resolve(error={'code': -32001, 'message': 'TernJS worker exited'})
+
+	def _read_stderr(self, proc, stream):
+		for line in iter(stream.readline, b''):
+			self.log(line.decode('utf-8').rstrip())
+
+
+class WorkerContext(Context):
+	"""
+	TernJS context that hosts tern in a separate process instead of PyV8.
+	Provides the same `js()` interface as `Context`: views passed
+	to `c.locals` methods are sent as snapshots
+
+	@param node: Path to Node.js binary
+	@param timeout: Max time, in seconds, to wait for request result
+	"""
+	def __init__(self, node='node', timeout=10, contrib=None, logger=None, reader=js_file_reader, on_restart=None):
+		Context.__init__(self, contrib=contrib, logger=logger, reader=reader)
+		self._use_unicode = True
+		self.timeout = timeout
+		self.client = RPCClient([node, WORKER_FILE] + self._core_files,
+			logger=self.log, on_restart=on_restart)
+
+	def js(self):
+		if not self._ctx:
+			try:
+				self.client.start()
+			except OSError as e:
+				self.log('Unable to start TernJS worker: %s' % e)
+				return None
+
+			self._ctx = WorkerProxy(self)
+
+		return self._ctx
+
+	def reset(self):
+		self._ctx = None
+		self.client.close()
+
+	def heap_statistics(self):
+		if not self.client.alive():
+			return None
+
+		try:
+			return self.client.call('heapStatistics', [], self.timeout)
+		except RPCError:
+			return None
+
+	def memory_usage(self):
+		"Returns memory usage of worker process, as reported by Node.js"
+		if not self.client.alive():
+			return None
+
+		try:
+			return self.client.call('memoryUsage', [], self.timeout)
+		except RPCError:
+			return None
+
+	def collect(self):
+		pass
+
+	def terminate(self):
+		self.client.kill()
+
+	def busy_file(self):
+		busy = self.client.busy_file
+		return tuple(busy) if busy else None
+
+	def eval(self, source):
+		raise RPCError('Evaluating code is not supported by TernJS worker')
+
+	def serialize(self, arg):
+		"Converts view into snapshot that can be sent to worker"
+		if hasattr(arg, 'buffer_id') and hasattr(arg, 'sel'):
+			sel = arg.sel()[0]
+			snapshot = {
+				'__view__': True,
+				'fileName': self._contrib['sublimeGetFileNameFromView'](arg),
+				'sel': [sel.a, sel.b],
+				'dirty': arg.is_dirty()
+			}
+			if snapshot['dirty']:
+				snapshot['text'] = self._contrib['sublimeViewContents'](arg)
+			return snapshot
+
+		return arg
+
+	def _call(self, method, args, guard=None):
+		self.crossings += 2
+		params = [self.serialize(a) for a in args]
+		try:
+			if not guard:
+				return self.client.call(method, params, self.timeout)
+
+			# time limit of guard doesn't include time
+			# request waits in worker queue
+			try:
+				return self.client.request(method, params, on_start=guard.start).wait(self.timeout)
+			finally:
+				guard.stop()
+		except RPCCancelled as e:
+			self.log('%s: %s' % (method, e))
+			return None
+
+
+class WorkerProxy():
+	"Context manager that mimics PyV8 `JSContext` for `WorkerContext`"
+	def __init__(self, ctx):
+		self.locals = WorkerLocals(ctx)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		pass
+
+class WorkerLocals():
+	def __init__(self, ctx):
+		self._ctx = ctx
+
+	def __getattr__(self, name):
+		if name.startswith('_'):
+			raise AttributeError(name)
+
+		ctx = self._ctx
+		return lambda *args: ctx.call(name, *args)
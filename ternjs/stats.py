@@ -0,0 +1,67 @@
+"""
+Runtime statistics of TernJS plugin, displayed by
+`TernJS: Show Statistics` command
+"""
+
+def hit_rate(hits, misses):
+	total = hits + misses
+	return 100.0 * hits / total if total else 0.0
+
+def cache_line(name, hits, misses, size=None):
+	"Returns report line with cache counters"
+	line = '%-20s %7d hits %7d misses %5.1f%% hit rate' % (name, hits, misses, hit_rate(hits, misses))
+	if size is not None:
+		line += ', %d entries' % size
+	return line
+
+def lru_line(name, cache):
+	"Returns report line for given `LRUCache` instance"
+	return cache_line(name, cache.hits, cache.misses, len(cache))
+
+def report(sections):
+	"""
+	Formats statistics report from given list
+	of `(title, lines)` tuples
+	"""
+	out = []
+	for title, lines in sections:
+		if lines:
+			out.append(title)
+			out.append('-' * len(title))
+			out += lines
+			out.append('')
+
+	return '\n'.join(out)
+
+PHASES = ['fetch', 'parse', 'infer', 'purge', 'query']
+COUNTERS = [('filesFetched', 'fetched'), ('filesParsed', 'parsed'),
+	('filesAnalyzed', 'analyzed'), ('astNodes', 'AST nodes'), ('typesPurged', 'purged')]
+
+def phase_line(timing):
+	"Returns line with phase timings of single TernJS request"
+	return 'total %d ms: %s' % (timing.get('total', 0),
+		', '.join('%s %d' % (p, timing.get(p, 0)) for p in PHASES))
+
+class PhaseStats():
+	"Aggregates phase timings and counters of TernJS requests by request type"
+	def __init__(self):
+		self.types = {}
+
+	def add(self, name, timing):
+		entry = self.types.get(name)
+		if not entry:
+			entry = self.types[name] = {'count': 0, 'max': 0}
+		entry['count'] += 1
+		entry['max'] = max(entry['max'], timing.get('total', 0))
+		for k in ['total'] + PHASES + [c[0] for c in COUNTERS]:
+			entry[k] = entry.get(k, 0) + timing.get(k, 0)
+
+	def lines(self):
+		out = []
+		for name in sorted(self.types):
+			e = self.types[name]
+			avg = lambda k: float(e.get(k, 0)) / e['count']
+			out.append('%-20s %7d requests, avg %.1f ms, max %d ms (%s)' % (name, e['count'], avg('total'), e['max'],
+				', '.join('%s %.1f' % (p, avg(p)) for p in PHASES)))
+			out.append('%-20s %s' % ('', ', '.join('%d %s' % (e.get(k, 0), title) for k, title in COUNTERS)))
+		return out
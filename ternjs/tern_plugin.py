@@ -3,8 +3,6 @@ import os.path
 import json
 from copy import copy
 
-_plugin_registry = set()
-
 try:
 	isinstance("", basestring)
 	def isstr(s):
@@ -13,23 +11,74 @@ except NameError:
 	def isstr(s):
 		return isinstance(s, str)
 
+class PluginCache():
+	"""
+	Cache of TernJS plugins evaluated in a single JS context.
+	Remembers resolved and failed plugin paths, so plugin file is
+	evaluated once per context and missing one is probed once.
+	Plugin definitions are kept as JSON strings for passing to JS,
+	where they are parsed once and shared across projects
+	(see `pluginDefinitions()` in controller.js)
+	"""
+	def __init__(self):
+		self.resolved = {}
+		self.evaluated = set()
+		self.failed = set()
+		self.definitions = {}
+
+	def forget_failed(self):
+		"Allows failed plugin paths to be probed again"
+		self.failed.clear()
+		for k in [k for k, v in self.resolved.items() if v is None]:
+			del self.resolved[k]
+
+def load_definitions(plugin_path, ctx):
+	"""
+	Returns definitions shipped with plugin as JSON string: a `.json`
+	file with the same name as plugin file
+	"""
+	defs_path = os.path.splitext(plugin_path)[0] + '.json'
+	try:
+		defs = ctx.read_js_file(defs_path, True)
+		json.loads(defs)
+		return defs
+	except Exception:
+		return None
+
 def get_plugin(plugin, ctx, project=None):
 	"Factory method that returns plugin instance for given spec"
 	plugin = parse_plugin_def(plugin, ctx, project)
 	p = TernPlugin(plugin)
-	if p.id not in _plugin_registry:
-		path = p.path
-		if not isinstance(path, list):
-			path = [path]
-
-		try:
-			for _p in path:
-				ctx.eval_js_file(_p)
-				p.path = _p
-				_plugin_registry.add(_p)
-				break
-		except Exception as e:
-			print(e)
+	cache = ctx.plugin_cache
+
+	paths = p.path
+	if not isinstance(paths, list):
+		paths = [paths]
+
+	key = (p.id, tuple(paths))
+	if key not in cache.resolved:
+		cache.resolved[key] = None
+		for _p in paths:
+			if _p in cache.failed:
+				continue
+
+			if _p not in cache.evaluated:
+				try:
+					ctx.eval_js_file(_p)
+				except Exception:
+					cache.failed.add(_p)
+					continue
+
+				cache.evaluated.add(_p)
+				cache.definitions[_p] = load_definitions(_p, ctx)
+
+			cache.resolved[key] = _p
+			break
+
+	resolved = cache.resolved[key]
+	if resolved:
+		p.path = resolved
+		p.definitions = cache.definitions.get(resolved)
 
 	return p
 
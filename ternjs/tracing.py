@@ -0,0 +1,190 @@
+"""
+Recording of Python/JS bridge calls for deterministic replay.
+
+Every call made through `Context.call()` is written as a JSON line:
+method, arguments, elapsed time, project id and query type. Long strings
+in arguments (file contents, libraries) and contents of files that
+TernJS reads are kept in a side store, keyed by content hash,
+so a trace can be replayed against the same project state later
+(see `misc/trace_replay.py`)
+"""
+import os
+import os.path
+import json
+import time
+import codecs
+import hashlib
+import threading
+
+TRACE_VERSION = 1
+
+# strings longer than this are moved from trace into side store
+MAX_INLINE_LENGTH = 256
+
+def text_hash(text):
+	if not isinstance(text, bytes):
+		text = text.encode('utf-8')
+	return hashlib.sha1(text).hexdigest()
+
+def project_file_path(project, f):
+	if not os.path.isabs(f) and project.get('dir'):
+		return os.path.join(project['dir'], f)
+	return f
+
+class BlobStore():
+	"Content-addressed store of texts"
+	def __init__(self, store_dir):
+		self.store_dir = store_dir
+		self._known = set()
+		if not os.path.exists(store_dir):
+			os.makedirs(store_dir)
+
+	def path(self, key):
+		return os.path.join(self.store_dir, key)
+
+	def put(self, text):
+		key = text_hash(text)
+		if key not in self._known:
+			self._known.add(key)
+			file_path = self.path(key)
+			if not os.path.exists(file_path):
+				with codecs.open(file_path, 'w', 'utf-8') as f:
+					f.write(text)
+		return key
+
+	def get(self, key):
+		with codecs.open(self.path(key), 'r', 'utf-8') as f:
+			return f.read()
+
+def pack(value, store):
+	"Replaces long strings in given value with references to side store"
+	if isinstance(value, dict):
+		return dict((k, pack(v, store)) for k, v in value.items())
+	if isinstance(value, (list, tuple)):
+		return [pack(v, store) for v in value]
+	if hasattr(value, 'encode') and len(value) > MAX_INLINE_LENGTH:
+		return {'$blob': store.put(value)}
+	return value
+
+def unpack(value, store):
+	"Restores value packed with `pack()`"
+	if isinstance(value, dict):
+		if '$blob' in value:
+			return store.get(value['$blob'])
+		if '$json' in value:
+			return json.dumps(unpack(value['$json'], store), ensure_ascii=False)
+		return dict((k, unpack(v, store)) for k, v in value.items())
+	if isinstance(value, list):
+		return [unpack(v, store) for v in value]
+	return value
+
+def pack_arg(arg, store):
+	"Packs bridge call argument. JSON strings are stored parsed, so offsets and queries stay readable"
+	if hasattr(arg, 'encode') and arg[:1] in ('{', '['):
+		try:
+			return {'$json': pack(json.loads(arg), store)}
+		except ValueError:
+			pass
+	return pack(arg, store)
+
+class Tracer():
+	"""
+	@param trace_dir: Folder for trace files and side store
+	"""
+	def __init__(self, trace_dir, logger=None):
+		self.trace_dir = trace_dir
+		self.store = BlobStore(os.path.join(trace_dir, 'blobs'))
+		self.file_path = os.path.join(trace_dir, 'trace-%s.jsonl' % time.strftime('%Y%m%d-%H%M%S'))
+		self.seq = 0
+		self._reads = None
+		self._lock = threading.RLock()
+		self._out = codecs.open(self.file_path, 'a', 'utf-8')
+		self._write({'version': TRACE_VERSION, 'started': time.time()})
+		if logger:
+			logger('Recording bridge calls to %s' % self.file_path)
+
+	def _write(self, record):
+		self._out.write(json.dumps(record, ensure_ascii=False) + '\n')
+		self._out.flush()
+
+	def snapshot(self, file_path, text=None):
+		"Stores contents of given file, read during current call"
+		if self._reads is None:
+			return
+
+		if text is None:
+			try:
+				with codecs.open(file_path, 'r', 'utf-8') as f:
+					text = f.read()
+			except (IOError, OSError, ValueError):
+				return
+
+		self._reads[file_path] = self.store.put(text)
+
+	def wrap_reader(self, reader):
+		"Wraps `sublimeReadFile` contrib so files read by TernJS are stored"
+		def wrapper(f, proj=None):
+			text = reader(f, proj)
+			if text is not None and not (f[:1] == '{' and f[-1:] == '}'):
+				self.snapshot(project_file_path(proj or {}, f), text)
+			return text
+		return wrapper
+
+	def call(self, method, args, fn):
+		"Runs given bridge call and records it"
+		with self._lock:
+			self._reads = {}
+			packed = [pack_arg(a, self.store) for a in args]
+			if method == 'startServer' and packed and isinstance(packed[0], dict):
+				# files of project are read inside JS engine,
+				# which can be out of process
+				project = packed[0]['$json']
+				for f in project.get('files', []):
+					self.snapshot(project_file_path(project, f))
+
+			started = time.time()
+			error = None
+			try:
+				result = fn()
+			except Exception as e:
+				error = str(e)
+				raise
+			finally:
+				self.seq += 1
+				record = {
+					'seq': self.seq,
+					'method': method,
+					'args': packed,
+					'elapsed': round((time.time() - started) * 1000, 3),
+					'files': self._reads
+				}
+				info = packed[0].get('$json') if packed and isinstance(packed[0], dict) else None
+				if isinstance(info, dict):
+					record['project'] = info.get('project', info.get('id'))
+					if 'query' in info:
+						record['query'] = info['query'].get('type')
+				elif packed and hasattr(packed[0], 'encode'):
+					record['project'] = packed[0]
+				if error:
+					record['error'] = error
+				self._reads = None
+				self._write(record)
+
+			return result
+
+	def close(self):
+		self._out.close()
+
+def read_trace(file_path):
+	"Returns records of given trace file"
+	records = []
+	with codecs.open(file_path, 'r', 'utf-8') as f:
+		for line in f:
+			line = line.strip()
+			if line:
+				records.append(json.loads(line))
+
+	if not records or records[0].get('version') != TRACE_VERSION:
+		raise ValueError('Unsupported trace file: %s' % file_path)
+
+	return records[1:]
@@ -0,0 +1,107 @@
+"""
+Detection of vendored copies of known libraries in project files.
+
+Projects often keep their own copy of jQuery or underscore, and
+analysis of these large files costs more than analysis of project
+code. Such files are detected by license banner or by content hash
+and replaced with bundled or user-provided defs of the library
+"""
+import os
+import os.path
+import re
+import hashlib
+
+# Libraries with bundled defs, detected by banner comment
+# at the beginning of file
+KNOWN_BANNERS = [
+	('jquery', re.compile(r'\bjQuery (?:JavaScript Library )?v\d')),
+	('underscore', re.compile(r'\bUnderscore\.js \d')),
+	# lodash builds are mostly compatible with underscore API
+	('underscore', re.compile(r'\b(?:Lo-Dash|[Ll]odash)\b[^\n]*<https?://lodash\.com'))
+]
+
+HEADER_SIZE = 1024
+
+# Vendored libraries are large, smaller files are not checked
+MIN_SIZE = 10 * 1024
+
+def match_banner(header):
+	"Returns name of library which banner is in given file header"
+	if not header.lstrip().startswith(('/*', '//')):
+		return None
+
+	for lib, pattern in KNOWN_BANNERS:
+		if pattern.search(header):
+			return lib
+
+	return None
+
+def file_hash(file_path):
+	"Returns SHA-1 hash of file contents, as used in `vendored_libs` setting"
+	sha = hashlib.sha1()
+	with open(file_path, 'rb') as f:
+		for chunk in iter(lambda: f.read(65536), b''):
+			sha.update(chunk)
+	return sha.hexdigest()
+
+class VendorDetector():
+	"""
+	@param hashes: Dict of SHA-1 hashes of file contents and libraries
+	they match: name of bundled library or path to defs file
+	@param min_size: Min size of file to check
+	"""
+	def __init__(self, hashes=None, min_size=MIN_SIZE):
+		self.hashes = hashes or {}
+		self.min_size = min_size
+		self._memo = {}
+
+	def detect_file(self, file_path):
+		"Returns library that given file is a copy of, if any"
+		try:
+			st = os.stat(file_path)
+		except OSError:
+			return None
+
+		if st.st_size < self.min_size:
+			return None
+
+		key = (st.st_mtime, st.st_size)
+		memo = self._memo.get(file_path)
+		if memo and memo[0] == key:
+			return memo[1]
+
+		try:
+			lib = self._detect(file_path)
+		except (IOError, OSError):
+			lib = None
+
+		self._memo[file_path] = (key, lib)
+		return lib
+
+	def _detect(self, file_path):
+		with open(file_path, 'rb') as f:
+			header = f.read(HEADER_SIZE)
+
+		lib = match_banner(header.decode('utf-8', 'ignore'))
+		if lib or not self.hashes:
+			return lib
+
+		return self.hashes.get(file_hash(file_path))
+
+	def detect(self, project):
+		"""
+		Returns dict of files of given project that are copies
+		of known libraries, with matched libraries
+		"""
+		proj_dir = project.get('dir')
+		result = {}
+		for f in project.get('files', []):
+			file_path = f
+			if not os.path.isabs(file_path) and proj_dir:
+				file_path = os.path.join(proj_dir, file_path)
+
+			lib = self.detect_file(file_path)
+			if lib:
+				result[f] = lib
+
+		return result
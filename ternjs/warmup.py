@@ -0,0 +1,133 @@
+"""
+Idle-time warm-up of project servers.
+
+Server doesn't analyze project files when started, so first query
+pays for analysis of whole project. Warm-up thread analyzes files of
+started servers in short slices while editor is idle: JS context is
+released between slices, so user queries are not blocked by warm-up.
+Where plugin API can't be used from threads, slices are run with
+`step()` from editor timer instead
+"""
+import json
+import time
+import threading
+
+import deadline
+
+class WarmUpScheduler(threading.Thread):
+	"""
+	@param ctx: TernJS context
+	@param time_slice: Max time, in milliseconds, of a single analysis slice
+	@param idle: Time, in seconds, since last user query to consider
+	editor idle
+	@param on_warm: Function called with project id, number of files
+	and warm-up time, in seconds, when all files of project are analyzed
+	@param kill_timeout: Hard limit, in seconds, of a single slice,
+	see `deadline.OverrunGuard`
+	@param on_overrun: Function called with project id when its slice
+	is terminated by hard limit
+	"""
+	def __init__(self, ctx, time_slice=50, idle=0.5, on_warm=None, logger=None,
+			kill_timeout=0, on_overrun=None):
+		threading.Thread.__init__(self)
+		self.daemon = True
+		self.ctx = ctx
+		self.time_slice = time_slice
+		self.idle = idle
+		self.on_warm = on_warm
+		self.logger = logger
+		self.kill_timeout = kill_timeout
+		self.on_overrun = on_overrun
+		self.queue = []
+		self.started = {}
+		self.last_activity = 0
+		self._cond = threading.Condition()
+		self._stopped = False
+
+	def log(self, message):
+		if self.logger:
+			self.logger(message)
+
+	def schedule(self, project_id):
+		"Queues warm-up of given project"
+		with self._cond:
+			if project_id not in self.queue:
+				self.queue.append(project_id)
+				self.started[project_id] = time.time()
+			self._cond.notify()
+
+	def cancel(self, project_id):
+		with self._cond:
+			if project_id in self.queue:
+				self.queue.remove(project_id)
+			self.started.pop(project_id, None)
+
+	def touch(self):
+		"Marks editor as busy with user request"
+		self.last_activity = time.time()
+
+	def stop(self):
+		with self._cond:
+			self._stopped = True
+			self.queue = []
+			self._cond.notify()
+
+	def _wait_idle(self):
+		while not self._stopped:
+			wait = self.last_activity + self.idle - time.time()
+			if wait <= 0:
+				return
+			time.sleep(wait)
+
+	def step(self):
+		"""
+		Runs analysis slice of first queued project if editor is idle.
+		Returns `True` if there's more work to do
+		"""
+		with self._cond:
+			if not self.queue or self._stopped:
+				return False
+			project_id = self.queue[0]
+
+		if time.time() - self.last_activity < self.idle:
+			return True
+
+		res = None
+		guard = deadline.OverrunGuard(self.ctx, self.kill_timeout)
+		try:
+			with guard:
+				res = self.ctx.call('ternWarmUp', project_id, self.time_slice, guard=guard)
+		except Exception as e:
+			self.log('Unable to warm up %s: %s' % (project_id, e))
+
+		res = json.loads(res) if res and not guard.fired else None
+		if res and res['analyzed'] < res['total']:
+			return True
+
+		with self._cond:
+			if project_id in self.queue:
+				self.queue.remove(project_id)
+			started = self.started.pop(project_id, None)
+			more = bool(self.queue)
+
+		if guard.fired:
+			self.log('Warm-up of %s terminated after %d ms' % (project_id, self.kill_timeout * 1000))
+			if self.on_overrun:
+				self.on_overrun(project_id)
+		elif res and started and self.on_warm:
+			self.on_warm(project_id, res['total'], time.time() - started)
+
+		return more
+
+	def run(self):
+		while True:
+			with self._cond:
+				while not self.queue and not self._stopped:
+					self._cond.wait()
+				if self._stopped:
+					return
+
+			self._wait_idle()
+			if self.step():
+				# yield JS context to pending user queries
+				time.sleep(0.001)
@@ -0,0 +1,104 @@
+"""
+Heap-budget watchdog for TernJS servers.
+
+Every project keeps its own TernJS server with a full type graph in
+engine memory. When configured memory budget is exceeded,
+least-recently-used servers are stopped; they will be started again
+on next request for their project
+"""
+import json
+import time
+
+# Approximate ratio of heap size to source size of analyzed files,
+# used when engine doesn't provide heap statistics
+SOURCE_HEAP_RATIO = 20
+
+class ServerWatchdog():
+	"""
+	@param ctx: TernJS context
+	@param budget: Memory budget, in megabytes. 0 disables watchdog
+	@param interval: Min time, in seconds, between memory checks
+	@param stop: Function that stops server of given project id,
+	by default server is just killed
+	"""
+	def __init__(self, ctx, budget=0, interval=10, logger=None, stop=None):
+		self.ctx = ctx
+		self.stop = stop or (lambda server_id: ctx.call('killServer', server_id))
+		self.budget = budget * 1024 * 1024
+		self.interval = interval
+		self.logger = logger
+		self.last_use = {}
+		self.evicted = set()
+		self._last_check = 0
+
+	def log(self, message):
+		if self.logger:
+			self.logger(message)
+
+	def touch(self, project_id):
+		"Marks server of given project as recently used"
+		self.last_use[project_id] = time.time()
+		self.evicted.discard(project_id)
+
+	def forget(self, project_id):
+		"Removes server of given project from tracking"
+		self.last_use.pop(project_id, None)
+		self.evicted.discard(project_id)
+
+	def is_evicted(self, project_id):
+		return project_id in self.evicted
+
+	def costs(self):
+		"""
+		Returns tuple of approximate heap cost of each server and
+		total heap usage. Sampled engine heap size is distributed among
+		servers proportionally to size of their sources
+		"""
+		info = json.loads(self.ctx.call('serverInfo'))
+
+		total_bytes = sum([s['bytes'] for s in info.values()])
+		heap = self.ctx.heap_statistics() or {}
+		used = heap.get('used_heap_size')
+
+		costs = {}
+		for server_id, data in info.items():
+			if used and total_bytes:
+				costs[server_id] = used * data['bytes'] / total_bytes
+			else:
+				costs[server_id] = data['bytes'] * SOURCE_HEAP_RATIO
+
+		return costs, used or sum(costs.values())
+
+	def check(self, keep=None, force=False):
+		"""
+		Stops least-recently-used servers until memory usage
+		is within budget. Returns list of stopped server ids
+		@param keep: Id of server that must not be stopped
+		"""
+		if not self.budget or not self.ctx.js():
+			return []
+
+		now = time.time()
+		if not force and now - self._last_check < self.interval:
+			return []
+
+		self._last_check = now
+		costs, used = self.costs()
+		evicted = []
+		for server_id in sorted(costs, key=lambda k: self.last_use.get(k, 0)):
+			if used <= self.budget:
+				break
+			if server_id == keep:
+				continue
+
+			self.stop(server_id)
+			used -= costs[server_id]
+			self.last_use.pop(server_id, None)
+			self.evicted.add(server_id)
+			evicted.append(server_id)
+			self.log('Memory budget exceeded, stopped server for %s' % server_id)
+
+		if evicted:
+			self.ctx.collect()
+
+		return evicted